@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量下载预估
+根据缓存的视频信息和所选格式汇总整批下载的大小，
+并按最近实测的下载吞吐量推算完成时间。
+存储预算模式下为每个视频选择分辨率档位，使整批在预算内的总画质最高。
+"""
+
+import heapq
+import math
+import threading
+import time
+from collections import deque
+
+
+def format_bytes(size):
+    """把字节数格式化为便于阅读的字符串"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds):
+    """把秒数格式化为 "1小时5分" / "12分" / "30秒" """
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}小时{minutes}分"
+    if minutes:
+        return f"{minutes}分"
+    return f"{seconds}秒"
+
+
+class ThroughputMeter:
+    """汇总所有并行任务的下载吞吐量（滑动窗口），可在多个线程中调用"""
+
+    def __init__(self, window=30):
+        self.window = window
+        self.lock = threading.Lock()
+        # (时间, 新增字节数)
+        self.samples = deque()
+        # 每个文件上次上报的已下载字节数
+        self.last_bytes = {}
+        # 本批已下载的字节数
+        self.batch_bytes = 0
+        # 窗口内没有样本时沿用最近一次的测量值
+        self.last_rate = 0.0
+
+    def update(self, key, downloaded_bytes):
+        """在进度回调中调用，key 区分不同任务的不同文件"""
+        if not downloaded_bytes:
+            return
+
+        now = time.time()
+        with self.lock:
+            delta = downloaded_bytes - self.last_bytes.get(key, 0)
+            self.last_bytes[key] = downloaded_bytes
+            if delta <= 0:
+                return
+            self.batch_bytes += delta
+            self.samples.append((now, delta))
+            self._trim(now)
+
+    def finish(self, key):
+        """文件下载结束后不再跟踪"""
+        with self.lock:
+            self.last_bytes.pop(key, None)
+
+    def _trim(self, now):
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    def rate(self):
+        """最近窗口内的总吞吐量（字节/秒），从未测量过时返回 0"""
+        now = time.time()
+        with self.lock:
+            self._trim(now)
+            if len(self.samples) >= 2:
+                span = max(now - self.samples[0][0], 1.0)
+                self.last_rate = sum(delta for _, delta in self.samples) / span
+            return self.last_rate
+
+    def reset_batch(self):
+        """新一批任务开始时清零已下载字节数"""
+        with self.lock:
+            self.batch_bytes = 0
+            self.last_bytes.clear()
+
+
+class BatchPlan:
+    """整批下载的预估结果"""
+
+    __slots__ = ('count', 'known', 'unknown', 'total_bytes')
+
+    def __init__(self, count=0, known=0, unknown=0, total_bytes=0):
+        self.count = count
+        self.known = known
+        self.unknown = unknown
+        self.total_bytes = total_bytes
+
+    def eta(self, downloaded_bytes, rate):
+        """剩余时间（秒），速度未知时返回 None"""
+        if not rate:
+            return None
+        return max(self.total_bytes - downloaded_bytes, 0) / rate
+
+
+def plan_batch(summaries, estimate):
+    """汇总一批视频的预计大小
+
+    summaries 为精简视频信息的列表（尚未解析的为 None），
+    estimate(summary) 返回单个视频的预计字节数，无法估算时返回 0。
+    """
+    plan = BatchPlan(count=len(summaries))
+    for summary in summaries:
+        size = estimate(summary) if summary is not None else 0
+        if size:
+            plan.known += 1
+            plan.total_bytes += size
+        else:
+            plan.unknown += 1
+    return plan
+
+
+def quality_score(height):
+    """画质得分，随分辨率对数增长：720p→1080p 的提升小于 360p→720p"""
+    return math.log2(max(height, 144))
+
+
+def fit_to_budget(options, budget):
+    """在总大小预算内为每个视频选择一个档位，使总画质得分最高（多选背包的贪心解）
+
+    options 为每个视频的档位列表 [(预计字节数, 画质得分), ...]，按大小升序；
+    返回 (每个视频选中的档位下标（没有档位的视频为 None）, 选中档位的总字节数)。
+    总字节数大于 budget 表示所有视频都取最小档位仍然超出预算。
+    所有视频先取最小档位，再按 "得分提升 / 新增字节" 从高到低依次升级，
+    因此长视频（升级代价大）会先被降档，短视频保持高分辨率。
+    """
+    chosen = []
+    hulls = []
+    used = 0
+    for item in options:
+        # 只保留上凸包上的档位，保证每一步升级的性价比递减
+        hull = []
+        for size, score in item:
+            if hull and score <= hull[-1][1]:
+                continue
+            while len(hull) >= 2:
+                (s1, q1), (s2, q2) = hull[-2], hull[-1]
+                if (q2 - q1) * (size - s2) <= (score - q2) * (s2 - s1):
+                    hull.pop()
+                else:
+                    break
+            hull.append((size, score))
+        hulls.append(hull)
+        chosen.append(0 if hull else None)
+        if hull:
+            used += hull[0][0]
+
+    def push(heap, i):
+        step = chosen[i]
+        if step + 1 < len(hulls[i]):
+            (s1, q1), (s2, q2) = hulls[i][step], hulls[i][step + 1]
+            heapq.heappush(heap, (-(q2 - q1) / max(s2 - s1, 1), i))
+
+    heap = []
+    for i, hull in enumerate(hulls):
+        if hull:
+            push(heap, i)
+
+    while heap:
+        _, i = heapq.heappop(heap)
+        step = chosen[i]
+        extra = hulls[i][step + 1][0] - hulls[i][step][0]
+        if used + extra > budget:
+            # 这个视频升级不起，其余视频可能还有更小的升级
+            continue
+        used += extra
+        chosen[i] = step + 1
+        push(heap, i)
+
+    # 把凸包下标换回原档位列表的下标
+    result = []
+    for item, hull, step in zip(options, hulls, chosen):
+        result.append(None if step is None else item.index(hull[step]))
+    return result, used
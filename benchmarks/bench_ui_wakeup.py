@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面事件唤醒性能测试
+比较原先每 100 毫秒轮询结果队列与事件唤醒（ui_dispatch.UIEventQueue.bind_tk）两种方式：
+空闲时的唤醒次数和 CPU 占用，以及工作线程发布事件到界面线程处理之间的延迟。
+需要图形界面环境（Tk 窗口不会显示）。
+
+用法: python benchmarks/bench_ui_wakeup.py [空闲秒数] [事件数]
+"""
+
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui_dispatch import UIEventQueue, WAKEUP_EVENT
+
+POLL_INTERVAL_MS = 100
+
+
+def run(root, mode, idle_seconds, event_count):
+    """运行一种方式，返回 (空闲唤醒次数, 空闲 CPU 毫秒, 延迟列表毫秒)"""
+    events = UIEventQueue()
+    state = {'wakeups': 0, 'latencies': [], 'poll_id': None}
+
+    def process():
+        state['wakeups'] += 1
+        for event in events.drain():
+            if event[0] == 'call':
+                event[1](*event[2])
+            else:
+                state['latencies'].append((time.perf_counter() - event[1]) * 1000)
+
+    def poll():
+        process()
+        state['poll_id'] = root.after(POLL_INTERVAL_MS, poll)
+
+    if mode == 'poll':
+        poll()
+    else:
+        events.bind_tk(root, process)
+
+    # 空闲阶段：没有任何事件
+    root.after(int(idle_seconds * 1000), root.quit)
+    cpu_started = time.process_time()
+    root.mainloop()
+    idle_cpu_ms = (time.process_time() - cpu_started) * 1000
+    idle_wakeups = state['wakeups']
+
+    # 延迟阶段：工作线程按随机间隔发布事件，结束后通过队列通知界面线程退出
+    def worker():
+        rng = random.Random(0)
+        for _ in range(event_count):
+            time.sleep(rng.uniform(0.005, 0.03))
+            events.put(('event', time.perf_counter()))
+        events.call(root.quit)
+
+    threading.Thread(target=worker, daemon=True).start()
+    root.mainloop()
+
+    if state['poll_id'] is not None:
+        root.after_cancel(state['poll_id'])
+    root.unbind(WAKEUP_EVENT)
+    return idle_wakeups, idle_cpu_ms, state['latencies']
+
+
+def main():
+    idle_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"无法创建 Tk 窗口（需要图形界面环境）: {e}")
+        sys.exit(1)
+    root.withdraw()
+
+    print(f"空闲 {idle_seconds:g} 秒，{event_count} 个事件")
+    for mode, name in (('poll', f'轮询 ({POLL_INTERVAL_MS} ms)'), ('event', '事件唤醒')):
+        wakeups, cpu_ms, latencies = run(root, mode, idle_seconds, event_count)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<14} 空闲唤醒 {wakeups / idle_seconds:6.1f} 次/秒  空闲 CPU {cpu_ms:7.1f} ms  "
+              f"延迟 中位数 {statistics.median(latencies):6.2f} ms  p95 {p95:6.2f} ms  最大 {latencies[-1]:6.2f} ms")
+
+    root.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+链接规范化性能测试
+生成十万行混合格式的链接，比较 url_utils 与原先 urlparse + parse_qs 的处理耗时。
+
+用法: python benchmarks/bench_url_utils.py [行数]
+"""
+
+import os
+import random
+import string
+import sys
+import time
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from url_utils import normalize_urls
+
+TEMPLATES = (
+    "https://www.youtube.com/watch?v={id}",
+    "https://www.youtube.com/watch?v={id}&list=RD{id}&start_radio=1",
+    "https://music.youtube.com/watch?v={id}&si=abcdEFGH1234",
+    "https://youtu.be/{id}?si=abcdEFGH1234&t=42",
+    "https://www.youtube.com/shorts/{id}",
+    "https://m.youtube.com/live/{id}?feature=share",
+    "https://www.youtube.com/embed/{id}",
+    "https://www.youtube.com/playlist?list=PL{id}",
+    "https://www.youtube.com/@channel{n}/videos",
+    "https://example.com/not-youtube/{n}",
+    "",
+)
+
+
+def make_lines(count):
+    rng = random.Random(0)
+    alphabet = string.ascii_letters + string.digits + '-_'
+    lines = []
+    for n in range(count):
+        video_id = ''.join(rng.choice(alphabet) for _ in range(11))
+        lines.append(rng.choice(TEMPLATES).format(id=video_id, n=n))
+    return lines
+
+
+def legacy_normalize(lines):
+    """原先的逐行 urlparse + parse_qs 处理（作为对比基准）"""
+    domains = ('youtube.com', 'www.youtube.com', 'youtu.be', 'www.youtu.be', 'music.youtube.com', 'm.youtube.com')
+    result = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        parsed = urlparse(line)
+        if not (parsed.scheme and parsed.netloc) or parsed.netloc.lower() not in domains:
+            continue
+        query_params = parse_qs(parsed.query)
+        result.append((line, query_params.get('v', [None])[0]))
+    return result
+
+
+def measure(func, lines, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(lines)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lines = make_lines(count)
+
+    recognised = len(normalize_urls(lines))
+    new_time = measure(normalize_urls, lines)
+    old_time = measure(legacy_normalize, lines)
+
+    print(f"行数: {count}, 识别: {recognised}")
+    print(f"url_utils.normalize_urls: {new_time * 1000:.1f} ms ({new_time / count * 1e6:.2f} µs/行)")
+    print(f"urlparse + parse_qs:      {old_time * 1000:.1f} ms ({old_time / count * 1e6:.2f} µs/行)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载存档
+记录已下载完成的视频（每行 "<提取器> <视频ID>"，与 yt-dlp 的 --download-archive 文件格式相同），
+下载前先查询，已下载过的视频无需解析即可跳过。
+"""
+
+import os
+import threading
+
+
+class DownloadArchive:
+    """已完成视频的集合，启动时载入内存，新增记录追加写入文件；所有方法均可在多个线程中调用"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = set()
+        self.existed = os.path.exists(path)
+
+        if self.existed:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.entries.add(line)
+
+    @staticmethod
+    def make_id(extractor, video_id):
+        """存档记录的键，与 yt-dlp 相同：提取器名称小写 + 空格 + 视频ID"""
+        return f"{extractor.lower()} {video_id}"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def contains(self, extractor, video_id):
+        if not video_id:
+            return False
+        return self.make_id(extractor, video_id) in self.entries
+
+    def add_many(self, items):
+        """批量添加 [(extractor, video_id), ...]，已存在的记录被忽略"""
+        with self.lock:
+            lines = []
+            for extractor, video_id in items:
+                archive_id = self.make_id(extractor, video_id)
+                if video_id and archive_id not in self.entries:
+                    self.entries.add(archive_id)
+                    lines.append(archive_id + '\n')
+            if lines:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+
+    def add(self, extractor, video_id):
+        self.add_many([(extractor, video_id)])
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载任务状态
+每个下载任务持有独立的状态，替代原先共享的 is_downloading / current_task_index 字段，
+使多个任务可以由工作线程池并行执行。
+"""
+
+import os
+import platform
+import signal
+import subprocess
+import threading
+import time
+import weakref
+
+
+class DownloadCancelled(Exception):
+    """任务已被取消"""
+
+
+class CancellationToken:
+    """任务取消令牌
+
+    由界面线程调用 cancel()；下载线程在进度回调中调用 raise_if_cancelled()
+    立即中断 yt-dlp 传输，子进程后端通过 on_cancel() 注册终止回调。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消任务并执行已注册的回调（只执行一次）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """注册取消回调，若已取消则立即执行"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise DownloadCancelled()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+
+def process_group_kwargs():
+    """让子进程单独成组，取消时可以连同其子进程（如 ffmpeg）一起结束"""
+    if platform.system() == 'Windows':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def terminate_process_tree(process):
+    """结束子进程及其派生的所有进程"""
+    if process.poll() is not None:
+        return
+
+    try:
+        if platform.system() == 'Windows':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        process.kill()
+
+
+# 当前线程登记子进程的集合（collect_child_processes 之后才登记）
+_local = threading.local()
+_tracked_classes = {}
+
+
+def track_child_processes(*modules):
+    """把这些模块中的 Popen（yt-dlp 的 ffmpeg 后处理、外部下载器）替换为登记子进程的子类
+
+    yt-dlp 在下载线程中同步运行 ffmpeg 合并/转换，期间不会调用进度回调，取消时只能直接结束子进程。
+    """
+    for module in modules:
+        base = module.Popen
+        tracked = _tracked_classes.get(base)
+        if tracked is None:
+            class TrackedPopen(base):
+                def __init__(self, *args, **kwargs):
+                    super().__init__(*args, **kwargs)
+                    processes = getattr(_local, 'processes', None)
+                    if processes is not None:
+                        processes.add(self)
+
+            tracked = _tracked_classes[base] = _tracked_classes[TrackedPopen] = TrackedPopen
+        module.Popen = tracked
+
+
+def collect_child_processes():
+    """开始登记当前线程之后启动的子进程，返回登记集合"""
+    _local.processes = weakref.WeakSet()
+    return _local.processes
+
+
+def kill_processes(processes):
+    """结束集合中仍在运行的子进程"""
+    for process in list(processes):
+        try:
+            if process.poll() is None:
+                process.kill()
+        except OSError:
+            pass
+
+
+# yt-dlp 命令行后端的进度输出格式（配合 --newline 使用），只输出原始数值，缺失的字段为 NA
+PROGRESS_PREFIX = '[progress]'
+PROGRESS_TEMPLATE = ('download:' + PROGRESS_PREFIX + ' %(progress.downloaded_bytes)s %(progress.total_bytes)s '
+                     '%(progress.total_bytes_estimate)s %(progress.speed)s %(progress.eta)s')
+
+
+def parse_progress_line(line):
+    """解析 PROGRESS_TEMPLATE 输出的一行，返回与进度回调相同字段的字典，不是进度行时返回 None"""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+
+    def number(value):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    fields = [number(value) for value in line[len(PROGRESS_PREFIX):].split()]
+    if len(fields) != 5:
+        return None
+    downloaded, total, estimate, speed, eta = fields
+    return {'downloaded_bytes': downloaded or 0, 'total_bytes': total or estimate or 0,
+            'speed': speed, 'eta': eta}
+
+
+class DownloadTask:
+    """单个下载任务及其运行状态"""
+
+    # 可持久化的下载选项
+    OPTION_FIELDS = ('proxy', 'save_path', 'format_id', 'download_subtitles',
+                     'thread_count', 'transcode', 'transcode_format')
+
+    def __init__(self, task_id, index, url, proxy, save_path, format_id,
+                 download_subtitles, thread_count, transcode, transcode_format):
+        self.task_id = task_id
+        self.index = index
+        self.url = url
+        self.proxy = proxy
+        self.save_path = save_path
+        self.format_id = format_id
+        self.download_subtitles = download_subtitles
+        self.thread_count = thread_count
+        self.transcode = transcode
+        self.transcode_format = transcode_format
+
+        # 运行状态
+        self.cancel_token = CancellationToken()
+        self.status = 'queued'
+        self.title = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        # 任务日志中的记录ID，以及状态变化回调 on_change(task)
+        self.job_id = None
+        self.on_change = None
+        # 去重索引中的键（规范化后的视频ID）
+        self.dedup_key = None
+        # 增量同步的来源，下载完成后记入其同步位置
+        self.sync_source = None
+        
+        # 下载进度：由进度回调原地更新，界面按固定帧率读取
+        self.filename = None
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.speed = None
+        self.eta = None
+        self.milestone = 0
+        # 整个任务的预计字节数（界面按缓存的视频信息估算一次，0 表示无法估算）
+        self.estimated_bytes = None
+
+    @classmethod
+    def from_options(cls, task_id, index, url, options):
+        """根据持久化的选项重建任务"""
+        return cls(task_id, index, url, *(options.get(name) for name in cls.OPTION_FIELDS))
+
+    def options(self):
+        """可持久化的下载选项"""
+        return {name: getattr(self, name) for name in self.OPTION_FIELDS}
+
+    @property
+    def label(self):
+        """日志中使用的任务标识"""
+        return f"[#{self.index}]"
+
+    def mark(self, status, error=None):
+        """更新任务状态"""
+        changed = status != self.status
+        self.status = status
+        if status != 'queued' and self.started_at is None:
+            self.started_at = time.time()
+        if status in ('done', 'failed', 'cancelled'):
+            self.finished_at = time.time()
+        if error is not None:
+            self.error = error
+        if changed and self.on_change:
+            self.on_change(self)
+
+    # 日志中记录的进度里程碑（百分比）
+    PROGRESS_MILESTONES = (25, 50, 75)
+    
+    def update_progress(self, d):
+        """用 yt-dlp 的 'downloading' 回调数据更新进度，跨过新的里程碑时返回该百分比，否则返回 None"""
+        if d.get('filename') != self.filename:
+            self.filename = d.get('filename')
+            self.milestone = 0
+        self.downloaded_bytes = d.get('downloaded_bytes') or 0
+        self.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        self.speed = d.get('speed')
+        self.eta = d.get('eta')
+        
+        percent = self.percent
+        if percent is None:
+            return None
+        reached = [m for m in self.PROGRESS_MILESTONES if m > self.milestone and percent >= m]
+        if not reached:
+            return None
+        self.milestone = reached[-1]
+        return self.milestone
+    
+    @property
+    def percent(self):
+        """当前文件的下载百分比，总大小未知时返回 None"""
+        if not self.total_bytes:
+            return None
+        return min(self.downloaded_bytes * 100 / self.total_bytes, 100.0)
+    
+    @property
+    def elapsed(self):
+        """任务已耗时（秒）"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+格式选择引擎
+按声明的约束（最高分辨率、帧率上限、编码偏好、容器兼容性、大小/码率预算）
+对格式表中的所有组合打分，生成最优的 yt-dlp 格式选择语句及备选项。
+"""
+
+# 编码名称前缀 -> 编码族
+VIDEO_CODEC_FAMILIES = (('avc1', 'avc1'), ('h264', 'avc1'), ('vp09', 'vp9'), ('vp9', 'vp9'),
+                        ('av01', 'av01'), ('hev1', 'hevc'), ('hvc1', 'hevc'))
+AUDIO_CODEC_FAMILIES = (('mp4a', 'mp4a'), ('aac', 'mp4a'), ('opus', 'opus'), ('vorbis', 'vorbis'))
+
+# 编码族在格式选择语句中的前缀写法
+CODEC_SELECTOR_PREFIX = {'avc1': 'avc1', 'vp9': 'vp09', 'av01': 'av01', 'hevc': 'hvc1', 'mp4a': 'mp4a',
+                         'opus': 'opus', 'vorbis': 'vorbis'}
+
+# 容器可以直接合并（无需重新编码）的视频/音频扩展名
+CONTAINER_EXTS = {
+    'mp4': (('mp4',), ('m4a', 'mp4')),
+    'webm': (('webm',), ('webm',)),
+}
+
+
+def codec_family(codec, families):
+    """把 'avc1.640028' 之类的编码名称归类为编码族，未知时返回原名称"""
+    codec = (codec or 'unknown').lower()
+    for prefix, family in families:
+        if codec.startswith(prefix):
+            return family
+    return codec
+
+
+class FormatConstraints:
+    """格式约束，None 表示不限制
+
+    video_codecs / audio_codecs 为按优先级排列的编码族（如 ('avc1', 'vp9')），
+    container 为 'mp4' 或 'webm' 时只组合可以直接封装进该容器的格式。
+    max_bytes 为整个视频的大小预算（字节），max_tbr 为视频+音频总码率预算（kbps）。
+    """
+
+    def __init__(self, max_height=None, max_fps=None, video_codecs=(), audio_codecs=(),
+                 container=None, max_bytes=None, max_tbr=None):
+        self.max_height = max_height
+        self.max_fps = max_fps
+        self.video_codecs = tuple(video_codecs)
+        self.audio_codecs = tuple(audio_codecs)
+        self.container = container
+        self.max_bytes = max_bytes
+        self.max_tbr = max_tbr
+
+    def is_default(self):
+        """是否未设置任何约束"""
+        return not (self.max_height or self.max_fps or self.video_codecs or self.audio_codecs
+                    or self.container or self.max_bytes or self.max_tbr)
+
+    def selector(self):
+        """不依赖具体格式ID的通用选择语句，由 yt-dlp 在下载时对每个视频求值"""
+        limits = ''
+        if self.max_height:
+            limits += f"[height<=?{self.max_height}]"
+        if self.max_fps:
+            limits += f"[fps<=?{self.max_fps}]"
+        if self.max_bytes:
+            limits += f"[filesize_approx<=?{self.max_bytes}]"
+
+        video_exts, audio_exts = CONTAINER_EXTS.get(self.container, ((), ()))
+        audio = 'ba'
+        if audio_exts:
+            audio += f"[ext={audio_exts[0]}]"
+        elif self.audio_codecs:
+            audio += f"[acodec^={CODEC_SELECTOR_PREFIX.get(self.audio_codecs[0], self.audio_codecs[0])}]"
+
+        alternatives = []
+        for codec in self.video_codecs:
+            prefix = CODEC_SELECTOR_PREFIX.get(codec, codec)
+            alternatives.append(f"bv*{limits}[vcodec^={prefix}]+{audio}")
+        if video_exts:
+            alternatives.append(f"bv*{limits}[ext={video_exts[0]}]+{audio}")
+        alternatives.append(f"bv*{limits}+ba")
+        alternatives.append(f"b{limits}")
+        alternatives.append('b')
+        return '/'.join(dict.fromkeys(alternatives))
+
+
+def _preference(family, preferred):
+    """编码偏好得分：越靠前越高，不在列表中为 0"""
+    if family in preferred:
+        return len(preferred) - preferred.index(family)
+    return 0
+
+
+def rank_formats(table, constraints, duration=None):
+    """按约束为所有可用组合打分，返回 [(video_index, audio_index 或 None), ...]，最优在前
+
+    硬约束（分辨率、帧率、容器、大小/码率预算）不满足的组合被排除；
+    其余按 分辨率 > 编码偏好 > 帧率 > 码率 排序。大小或码率未知时视为满足预算。
+    """
+    c = constraints
+    video_exts, audio_exts = CONTAINER_EXTS.get(c.container, ((), ()))
+
+    def video_ok(i):
+        if c.max_height and table.height[i] > c.max_height:
+            return False
+        if c.max_fps and table.fps[i] > c.max_fps:
+            return False
+        return not video_exts or table.exts[i] in video_exts
+
+    videos = [i for i in table.video_only() if video_ok(i)]
+    audios = [i for i in table.audio_only() if not audio_exts or table.exts[i] in audio_exts]
+    candidates = [(v, a) for v in videos for a in audios]
+    # 没有可组合的分离流时使用音视频合一的格式
+    if not candidates:
+        candidates = [(i, None) for i in table.muxed() if video_ok(i)]
+
+    def within_budget(pair):
+        parts = [i for i in pair if i is not None]
+        if c.max_bytes:
+            size = sum(table.size_of(i, duration) for i in parts)
+            if size and size > c.max_bytes:
+                return False
+        if c.max_tbr:
+            tbr = sum(table.tbr[i] for i in parts)
+            if tbr and tbr > c.max_tbr:
+                return False
+        return True
+
+    def score(pair):
+        v, a = pair
+        vcodec = codec_family(table.vcodec_name(v), VIDEO_CODEC_FAMILIES)
+        acodec = codec_family(table.acodec_name(a if a is not None else v), AUDIO_CODEC_FAMILIES)
+        return (table.height[v],
+                _preference(vcodec, c.video_codecs),
+                _preference(acodec, c.audio_codecs),
+                table.fps[v],
+                table.tbr[v],
+                table.abr[a] if a is not None else table.abr[v])
+
+    return sorted(filter(within_budget, candidates), key=score, reverse=True)
+
+
+def select_format(table, constraints, duration=None, fallbacks=2):
+    """生成格式选择语句：最优组合 + 若干备选组合 + 通用选择器兜底
+
+    例如 "137+140/136+140/bv*[height<=?1080][vcodec^=avc1]+ba[ext=m4a]/bv*[height<=?1080]+ba/b[height<=?1080]/b"。
+    """
+    alternatives = []
+    for v, a in rank_formats(table, constraints, duration):
+        spec = table.format_ids[v] if a is None else f"{table.format_ids[v]}+{table.format_ids[a]}"
+        # 备选项使用不同的视频流，同一视频流换音频意义不大
+        if any(alt.split('+')[0] == table.format_ids[v] for alt in alternatives):
+            continue
+        alternatives.append(spec)
+        if len(alternatives) > fallbacks:
+            break
+    alternatives.append(constraints.selector())
+    return '/'.join(alternatives)
+
+
+def format_options(table, constraints, duration=None):
+    """每个分辨率档位的最优组合 [(格式语句, 预计字节数, 分辨率), ...]，按分辨率升序
+
+    供存储预算模式在不同档位之间取舍；大小无法估算的档位被忽略。
+    """
+    best = {}
+    for v, a in rank_formats(table, constraints, duration):
+        height = table.height[v]
+        if height in best:
+            continue
+        parts = [v] if a is None else [v, a]
+        size = sum(table.size_of(i, duration) for i in parts)
+        if size:
+            best[height] = ('+'.join(table.format_ids[i] for i in parts), size, height)
+    return [best[height] for height in sorted(best)]
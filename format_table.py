@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑格式表
+把 yt-dlp 的格式字典列表转换为按列存储的数组（分辨率、帧率、码率、大小、编码ID），
+每个视频只构建一次，格式窗口、格式选择引擎和缓存层共用。
+100+ 个格式时比保留原始字典节省大量内存，筛选和排序也只需遍历数组。
+"""
+
+import re
+from array import array
+
+# 编码名称 'none'（明确没有该流）固定映射为 0；编码缺失（未知）映射为 1，与 yt-dlp 一样视为可能有该流
+NO_CODEC = 0
+UNKNOWN_CODEC = 1
+
+# 格式选择语句中可以直接解析的简单选择器
+BEST_VIDEO_SELECTORS = ('bv', 'bv*', 'bestvideo', 'bestvideo*')
+BEST_AUDIO_SELECTORS = ('ba', 'ba*', 'bestaudio', 'bestaudio*')
+BEST_SELECTORS = ('b', 'b*', 'best', 'best*')
+# 其余的格式关键字（worst、bv.2、mergeall 等），以及过滤条件、分组等无法在这里解析的语法
+_KEYWORD_RE = re.compile(r'^(?:(?:b|w|best|worst)(?:v|a|video|audio)?\*?(?:\.\d+)?|all|mergeall)$')
+_SYNTAX_CHARS = frozenset('[]()*,')
+
+
+class FormatTable:
+    """按列存储的格式表，缺失的数值记为 0"""
+
+    __slots__ = ('format_ids', 'exts', 'codecs', 'width', 'height', 'fps',
+                 'tbr', 'abr', 'filesize', 'vcodec', 'acodec')
+
+    def __init__(self):
+        self.format_ids = []
+        self.exts = []
+        # 编码名称驻留表，vcodec/acodec 列只保存下标
+        self.codecs = ['none', None]
+        self.width = array('H')
+        self.height = array('H')
+        self.fps = array('f')
+        self.tbr = array('f')
+        self.abr = array('f')
+        self.filesize = array('q')
+        self.vcodec = array('H')
+        self.acodec = array('H')
+
+    @classmethod
+    def from_formats(cls, formats):
+        """从 yt-dlp 的 formats 列表构建"""
+        table = cls()
+        codec_ids = {'none': NO_CODEC}
+
+        def intern(codec):
+            if not codec:
+                return UNKNOWN_CODEC
+            codec_id = codec_ids.get(codec)
+            if codec_id is None:
+                codec_id = codec_ids[codec] = len(table.codecs)
+                table.codecs.append(codec)
+            return codec_id
+
+        for f in formats or []:
+            table.format_ids.append(str(f.get('format_id', '')))
+            table.exts.append(f.get('ext') or '')
+            table.width.append(min(int(f.get('width') or 0), 0xFFFF))
+            table.height.append(min(int(f.get('height') or 0), 0xFFFF))
+            table.fps.append(float(f.get('fps') or 0))
+            table.tbr.append(float(f.get('tbr') or 0))
+            table.abr.append(float(f.get('abr') or 0))
+            table.filesize.append(int(f.get('filesize') or f.get('filesize_approx') or 0))
+            table.vcodec.append(intern(f.get('vcodec')))
+            table.acodec.append(intern(f.get('acodec')))
+        return table
+
+    def __len__(self):
+        return len(self.format_ids)
+
+    def vcodec_name(self, i):
+        """视频编码名称，没有视频流时为 'none'，未知时为 None"""
+        return self.codecs[self.vcodec[i]]
+
+    def acodec_name(self, i):
+        return self.codecs[self.acodec[i]]
+
+    # 筛选：返回下标列表
+    def video_only(self):
+        """纯视频格式（有分辨率）"""
+        return [i for i, (v, a, h) in enumerate(zip(self.vcodec, self.acodec, self.height))
+                if v != NO_CODEC and a == NO_CODEC and h]
+
+    def audio_only(self):
+        """纯音频格式（有音频码率）"""
+        return [i for i, (v, a, abr) in enumerate(zip(self.vcodec, self.acodec, self.abr))
+                if v == NO_CODEC and a != NO_CODEC and abr]
+
+    def muxed(self):
+        """音视频合一的格式"""
+        return [i for i, (v, a) in enumerate(zip(self.vcodec, self.acodec))
+                if v != NO_CODEC and a != NO_CODEC]
+
+    # 排序
+    def sorted_by_quality(self, indexes=None):
+        """按分辨率、帧率降序排列的下标"""
+        if indexes is None:
+            indexes = range(len(self))
+        height, fps = self.height, self.fps
+        return sorted(indexes, key=lambda i: (height[i], fps[i]), reverse=True)
+
+    def best(self, indexes, column):
+        """在给定下标中取某列最大的一项，没有时返回 None"""
+        values = getattr(self, column)
+        return max(indexes, key=values.__getitem__, default=None)
+
+    def resolve(self, selector):
+        """把单个格式选择器解析为下标，无法解析（如带过滤条件）时返回 None"""
+        i = self.index_of(selector)
+        if i is not None:
+            return i
+        if selector in BEST_VIDEO_SELECTORS:
+            return self.best(self.sorted_by_quality(self.video_only()), 'height')
+        if selector in BEST_AUDIO_SELECTORS:
+            return self.best(self.audio_only(), 'abr')
+        if selector in BEST_SELECTORS:
+            return self.best(self.sorted_by_quality(self.muxed()), 'height')
+        return None
+
+    def size_of(self, i, duration=None):
+        """单个格式的大小（字节），没有 filesize 时按 tbr × 时长估算，未知时返回 0"""
+        if self.filesize[i]:
+            return self.filesize[i]
+        if self.tbr[i] and duration:
+            return int(self.tbr[i] * 1000 / 8 * duration)
+        return 0
+
+    def estimate_size(self, format_spec, duration=None):
+        """估算格式选择语句（如 "137+140/b"）将下载的字节数
+
+        与 yt-dlp 一样依次尝试每个 "/" 分隔的备选项：格式ID不存在或没有符合的格式时尝试下一个；
+        遇到无法解析的选择器（带过滤条件等）时无法确定实际会选中的格式，直接返回 0（未知）。
+        """
+        for alternative in (format_spec or '').split('/'):
+            parts = []
+            for part in alternative.split('+'):
+                part = part.strip()
+                i = self.resolve(part)
+                if i is None and part not in BEST_VIDEO_SELECTORS + BEST_AUDIO_SELECTORS + BEST_SELECTORS and (
+                        not part or _KEYWORD_RE.match(part) or _SYNTAX_CHARS.intersection(part)):
+                    return 0
+                parts.append(i)
+            if None not in parts:
+                return sum(self.size_of(i, duration) for i in parts)
+        return 0
+
+    def kind(self, i):
+        """格式类型说明"""
+        has_video = self.vcodec[i] != NO_CODEC
+        has_audio = self.acodec[i] != NO_CODEC
+        if has_video and has_audio:
+            return '视频+音频'
+        if has_video:
+            return '纯视频'
+        if has_audio:
+            return '纯音频'
+        return ''
+
+    def index_of(self, format_id):
+        """按格式ID查找下标，不存在时返回 None"""
+        try:
+            return self.format_ids.index(format_id)
+        except ValueError:
+            return None
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片并发自适应调节
+根据每个分片格式下载结束时测得的吞吐量和分片重试率，调整下一次分片下载使用的
+concurrent_fragment_downloads。yt-dlp 只在开始下载某个格式时读取该参数，
+因此调节发生在格式边界（同一任务的视频流 -> 音频流，以及后续任务）。
+"""
+
+import threading
+
+
+class FragmentConcurrencyTuner:
+    """在所有任务之间共享的分片并发调节器（加性增、乘性减）"""
+
+    def __init__(self, initial=4, minimum=1, maximum=16, step=2,
+                 max_error_rate=0.05, min_gain=0.10):
+        self.level = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.max_error_rate = max_error_rate
+        self.min_gain = min_gain
+        self.lock = threading.Lock()
+        # 最近一次观测: (并发数, 吞吐量 bytes/s)
+        self.last_sample = None
+
+    def start_level(self):
+        """新任务开始时使用的并发数"""
+        with self.lock:
+            return self.level
+
+    def record(self, level, throughput, fragments, retries):
+        """记录一次分片格式下载的结果，返回调整后的并发数"""
+        with self.lock:
+            error_rate = retries / max(fragments, 1)
+
+            if error_rate > self.max_error_rate:
+                # 出错较多：服务器限流或网络拥塞，并发减半
+                new_level = max(self.minimum, level // 2)
+            elif self.last_sample and self.last_sample[0] < level:
+                # 上一次提高并发后吞吐量提升不明显，则回退
+                prev_level, prev_throughput = self.last_sample
+                if throughput < prev_throughput * (1 + self.min_gain):
+                    new_level = prev_level
+                else:
+                    new_level = min(self.maximum, level + self.step)
+            else:
+                new_level = min(self.maximum, level + self.step)
+
+            self.last_sample = (level, throughput)
+            self.level = new_level
+            return new_level
+
+
+class FragmentSession:
+    """单个任务的分片下载观测，绑定到该任务的 YoutubeDL 参数"""
+
+    def __init__(self, tuner, on_message=None):
+        self.tuner = tuner
+        # yt-dlp 的警告和错误转发给 on_message('warning' 或 'error', 消息)
+        self.on_message = on_message
+        self.params = None
+        self.level = tuner.start_level()
+        self.retries = 0
+        self.fragment_count = None
+
+    def bind(self, params):
+        """绑定 YoutubeDL.params，后续调节直接作用于下一个格式的下载"""
+        self.params = params
+        params['concurrent_fragment_downloads'] = self.level
+
+    def on_progress(self, d):
+        """在进度回调中调用，分片格式下载结束时进行一次调节"""
+        if d.get('status') == 'downloading':
+            # 结束回调不携带分片数，在下载过程中记录
+            if d.get('fragment_count'):
+                self.fragment_count = d['fragment_count']
+            return
+
+        fragment_count, self.fragment_count = self.fragment_count, None
+        if d.get('status') != 'finished' or not fragment_count:
+            return
+
+        elapsed = d.get('elapsed') or 0
+        downloaded = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        if elapsed <= 0 or downloaded <= 0:
+            return
+
+        self.level = self.tuner.record(
+            self.level, downloaded / elapsed, fragment_count, self.retries)
+        self.retries = 0
+        if self.params is not None:
+            self.params['concurrent_fragment_downloads'] = self.level
+
+    # yt-dlp logger 接口：从调试输出中统计分片重试，警告和错误原样转发
+    def debug(self, msg):
+        if 'Retrying fragment' in msg or 'Skipping fragment' in msg:
+            self.retries += 1
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        if self.on_message:
+            self.on_message('warning', msg)
+
+    def error(self, msg):
+        if self.on_message:
+            self.on_message('error', msg)
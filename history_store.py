@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载历史（SQLite WAL 模式，只追加）
+每次下载完成只插入一行，不再整体重写 JSON 文件，也不限制条数；
+按视频ID、链接、时间和标题建立索引。写入由后台线程成批提交，下载线程不会被磁盘 I/O 阻塞。
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+# 每次提交最多合并的记录数
+BATCH_SIZE = 500
+
+COLUMNS = ('timestamp', 'video_id', 'url', 'title', 'format_id', 'save_path')
+
+
+class HistoryStore:
+    """下载历史表，所有方法均可在多个线程中调用"""
+
+    def __init__(self, db_path, on_error=None):
+        self.db_path = db_path
+        # 写入失败时的回调 on_error(消息)，在写入线程中调用；未提供时写入 logging
+        self.on_error = on_error
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                video_id TEXT,
+                url TEXT NOT NULL,
+                title TEXT,
+                format_id TEXT,
+                save_path TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_history_video_id ON history(video_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_history_url ON history(url)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_history_title ON history(title COLLATE NOCASE)")
+
+        # 待写入的记录，None 表示停止
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self.writer.start()
+
+    def add(self, entry):
+        """追加一条记录（字典，键见 COLUMNS），由后台线程写入"""
+        self.pending.put(tuple(entry.get(name) for name in COLUMNS))
+
+    def _write_loop(self):
+        while True:
+            rows = [self.pending.get()]
+            # 取出已排队的记录一起提交
+            while len(rows) < BATCH_SIZE:
+                try:
+                    rows.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            try:
+                if rows:
+                    self._write(rows)
+            finally:
+                for _ in range(len(rows) + stop):
+                    self.pending.task_done()
+            if stop:
+                return
+
+    def _write(self, rows):
+        """提交一批记录；整批失败时逐条重试，只跳过出错的记录"""
+        try:
+            self._insert(rows)
+            return
+        except Exception as e:
+            if len(rows) == 1:
+                self._report(f"写入下载历史失败: {e} {rows[0]!r}")
+                return
+            self._report(f"批量写入 {len(rows)} 条下载历史失败，逐条重试: {e}")
+
+        for row in rows:
+            try:
+                self._insert([row])
+            except Exception as e:
+                self._report(f"写入下载历史失败，已跳过: {e} {row!r}")
+
+    def _report(self, message):
+        if self.on_error is None:
+            logging.getLogger(__name__).error(message)
+            return
+        try:
+            self.on_error(message)
+        except Exception:
+            logging.getLogger(__name__).exception(message)
+
+    def _insert(self, rows):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def flush(self, timeout=None):
+        """等待已添加的记录全部写入；写入线程已停止或超时时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.pending.all_tasks_done:
+            while self.pending.unfinished_tasks:
+                if not self.writer.is_alive():
+                    return False
+                wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+                self.pending.all_tasks_done.wait(wait)
+        return True
+
+    def import_json(self, path, video_id_of=None):
+        """从旧版的 download_history.json 导入记录（按原顺序），返回导入的条数"""
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        rows = []
+        for entry in entries:
+            entry = dict(entry)
+            if not entry.get('url') or not entry.get('timestamp'):
+                continue
+            if not entry.get('video_id') and video_id_of:
+                entry['video_id'] = video_id_of(entry['url'])
+            rows.append(tuple(entry.get(name) for name in COLUMNS))
+        if rows:
+            self._insert(rows)
+        return len(rows)
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def rows(self, columns=COLUMNS):
+        """按时间从新到旧返回全部记录的指定列 [(...), ...]"""
+        with self.lock:
+            return self.conn.execute(f"SELECT {', '.join(columns)} FROM history ORDER BY id DESC").fetchall()
+
+    def video_ids(self):
+        """所有记录过的视频ID"""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT video_id FROM history WHERE video_id IS NOT NULL")]
+
+    def close(self):
+        """写完剩余的记录后关闭数据库"""
+        if self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+        with self.lock:
+            self.conn.close()
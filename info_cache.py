@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频信息缓存
+以视频ID为键，在内存和磁盘上缓存 yt-dlp 的 info_dict，带有效期（TTL）。
+获取信息、查询格式和下载共用同一份缓存，同一个视频只需解析一次。
+内存中的完整 info_dict 按近似字节数做 LRU 淘汰（淘汰后仍可从磁盘读取），
+界面只使用精简后的摘要（标题、时长、作者、ID 和紧凑的格式表）。
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from format_table import FormatTable
+
+# YouTube 视频ID只包含这些字符，可以安全地用作文件名
+VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{6,64}$')
+
+# 摘要中保留的字段
+SUMMARY_FIELDS = ('id', 'title', 'duration', 'uploader', 'view_count', 'webpage_url', 'epoch')
+
+
+def slim_info(info):
+    """把完整的 info_dict 精简为界面使用的摘要"""
+    summary = {key: info.get(key) for key in SUMMARY_FIELDS}
+    summary['format_table'] = FormatTable.from_formats(info.get('formats'))
+    return summary
+
+
+class InfoCache:
+    """带有效期的 info_dict 缓存（内存 + 磁盘）
+
+    缓存的 info_dict 应先经过 YoutubeDL.sanitize_info(info, remove_private_keys=True)，
+    这样既可以序列化为JSON，也可以直接交给 process_ie_result 重新选择格式并下载。
+    """
+
+    def __init__(self, cache_dir, ttl=1800, max_memory_bytes=64 * 1024 * 1024, max_summaries=5000):
+        self.cache_dir = cache_dir
+        # 流地址会在数小时后失效，下载前只复用较新的信息
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+        # 完整 info_dict 的 LRU，以 JSON 长度作为近似内存占用
+        self.max_memory_bytes = max_memory_bytes
+        self.memory = OrderedDict()
+        self.memory_sizes = {}
+        self.memory_bytes = 0
+
+        # 精简摘要体积很小，只按条数限制
+        self.max_summaries = max_summaries
+        self.summaries = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _remember(self, video_id, info, size):
+        """放入内存 LRU 并按字节数淘汰最久未使用的条目（调用方持有锁）"""
+        self._forget(video_id)
+        self.memory[video_id] = info
+        self.memory_sizes[video_id] = size
+        self.memory_bytes += size
+
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            old_id, _ = self.memory.popitem(last=False)
+            self.memory_bytes -= self.memory_sizes.pop(old_id)
+
+        self.summaries[video_id] = slim_info(info)
+        self.summaries.move_to_end(video_id)
+        while len(self.summaries) > self.max_summaries:
+            self.summaries.popitem(last=False)
+
+    def _forget(self, video_id):
+        """从内存 LRU 中移除（调用方持有锁）"""
+        if video_id in self.memory:
+            del self.memory[video_id]
+            self.memory_bytes -= self.memory_sizes.pop(video_id)
+
+    def _path(self, video_id):
+        return os.path.join(self.cache_dir, f"{video_id}.json.gz")
+
+    def _is_fresh(self, info):
+        return time.time() - info.get('epoch', 0) < self.ttl
+
+    def get(self, video_id):
+        """返回未过期的 info_dict，没有缓存时返回 None"""
+        if not video_id or not VIDEO_ID_RE.match(video_id):
+            return None
+
+        with self.lock:
+            info = self.memory.get(video_id)
+            if info is not None:
+                self.memory.move_to_end(video_id)
+        if info is not None:
+            if self._is_fresh(info):
+                return info
+            self.discard(video_id)
+            return None
+
+        path = self._path(video_id)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                text = f.read()
+            info = json.loads(text)
+        except (OSError, ValueError):
+            return None
+
+        if not self._is_fresh(info):
+            self.discard(video_id)
+            return None
+
+        with self.lock:
+            self._remember(video_id, info, len(text))
+        return info
+
+    def summary(self, video_id):
+        """返回未过期的精简摘要，没有缓存时返回 None"""
+        if not video_id:
+            return None
+
+        with self.lock:
+            summary = self.summaries.get(video_id)
+            if summary is not None:
+                self.summaries.move_to_end(video_id)
+        if summary is not None and self._is_fresh(summary):
+            return summary
+
+        info = self.get(video_id)
+        if info is None:
+            return None
+        with self.lock:
+            return self.summaries.get(video_id) or slim_info(info)
+
+    def put(self, video_id, info):
+        """写入缓存（内存立即可用，同时写入磁盘）"""
+        if not video_id or not VIDEO_ID_RE.match(video_id):
+            return
+
+        info.setdefault('epoch', int(time.time()))
+        text = json.dumps(info, ensure_ascii=False)
+        with self.lock:
+            self._remember(video_id, info, len(text))
+
+        # 先写临时文件再替换，避免崩溃时留下损坏的缓存
+        path = self._path(video_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def discard(self, video_id):
+        """删除某个视频的缓存"""
+        with self.lock:
+            self._forget(video_id)
+            self.summaries.pop(video_id, None)
+        try:
+            os.remove(self._path(video_id))
+        except OSError:
+            pass
+
+    def purge_expired(self):
+        """清理磁盘上过期的缓存文件"""
+        now = time.time()
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if now - os.path.getmtime(path) >= self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载任务日志（SQLite WAL 模式）
+记录每个任务的状态和下载选项，程序崩溃或重启后可以恢复未完成的任务。
+配合 yt-dlp 的 .part 断点续传，已下载的数据不会重复下载。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+# 任务状态
+STATES = ('queued', 'extracting', 'downloading', 'merging', 'done', 'failed', 'cancelled')
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+
+class JobJournal:
+    """持久化的任务表，所有方法均可在多个线程中调用"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                options TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                title TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state)")
+
+    def add_jobs(self, jobs):
+        """批量添加任务 [(url, options), ...]，返回对应的任务ID列表"""
+        now = time.time()
+        job_ids = []
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                for url, options in jobs:
+                    cursor = self.conn.execute(
+                        "INSERT INTO jobs (url, options, state, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                        (url, json.dumps(options, ensure_ascii=False), now, now))
+                    job_ids.append(cursor.lastrowid)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return job_ids
+
+    def update_state(self, job_id, state, title=None, error=None):
+        """更新任务状态"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, title = COALESCE(?, title), error = COALESCE(?, error), updated_at = ? WHERE id = ?",
+                (state, title, error, time.time(), job_id))
+
+    def update_options(self, job_id, options):
+        """更新任务选项（例如记录已确定的格式ID，恢复时选择相同的格式以续传 .part 文件）"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET options = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(options, ensure_ascii=False), time.time(), job_id))
+
+    def pending_jobs(self):
+        """返回所有未完成的任务 [(job_id, url, options, state), ...]，按添加顺序排列"""
+        placeholders = ', '.join('?' * len(FINISHED_STATES))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, url, options, state FROM jobs WHERE state NOT IN ({placeholders}) ORDER BY id",
+                FINISHED_STATES).fetchall()
+        return [(job_id, url, json.loads(options), state) for job_id, url, options, state in rows]
+
+    def purge_finished(self):
+        """删除已结束的任务记录"""
+        placeholders = ', '.join('?' * len(FINISHED_STATES))
+        with self.lock:
+            self.conn.execute(f"DELETE FROM jobs WHERE state IN ({placeholders})", FINISHED_STATES)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
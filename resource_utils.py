@@ -1,6 +1,7 @@
 
 import os
 import sys
+import platform
 import tempfile
 import shutil
 
@@ -32,3 +33,17 @@ def get_tool_path(tool_name):
             return os.path.abspath(tool_name)
     
     return tool_name  # 回退到系统PATH
+
+def get_data_dir():
+    """获取当前用户的数据目录（任务记录、缓存、历史等），不存在时自动创建"""
+    if platform.system() == 'Windows':
+        base_dir = os.environ.get('APPDATA') or os.path.expanduser('~')
+        data_dir = os.path.join(base_dir, 'VideoMaster Pro')
+    elif platform.system() == 'Darwin':
+        data_dir = os.path.expanduser('~/Library/Application Support/VideoMaster Pro')
+    else:
+        base_dir = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+        data_dir = os.path.join(base_dir, 'videomaster_pro')
+    
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频道/播放列表增量同步状态
+为每个来源记录最近见过的若干个视频ID（高水位），
+下次同步时按从新到旧的顺序翻页，遇到已知视频即停止，只需请求少量页面。
+"""
+
+import json
+import os
+import threading
+import time
+
+# 每个来源保留的最新视频ID数量（最新的视频被删除时仍能找到停止点）
+MAX_KNOWN_IDS = 30
+
+
+class SyncState:
+    """各来源的同步高水位，保存为 JSON 文件；所有方法均可在多个线程中调用"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.sources = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.sources = json.load(f)
+        except (OSError, ValueError):
+            self.sources = {}
+
+    def known_ids(self, source):
+        """来源最近见过的视频ID集合，从未同步过时为空"""
+        with self.lock:
+            return set(self.sources.get(source, {}).get('ids', []))
+
+    def last_synced(self, source):
+        """上次同步的时间戳，从未同步过时返回 None"""
+        with self.lock:
+            return self.sources.get(source, {}).get('synced_at')
+
+    def record(self, source, new_ids):
+        """记录本次同步见到的新视频ID（按从新到旧排列）"""
+        with self.lock:
+            entry = self.sources.setdefault(source, {'ids': []})
+            ids = [video_id for video_id in new_ids if video_id] + entry['ids']
+            entry['ids'] = list(dict.fromkeys(ids))[:MAX_KNOWN_IDS]
+            entry['synced_at'] = time.time()
+            self._save()
+
+    def _save(self):
+        """先写临时文件再替换（调用方持有锁）"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sources, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
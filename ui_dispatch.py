@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面事件队列
+工作线程只发布事件（(类型, 参数...) 元组），由界面线程定时批量取出并操作控件，
+Tk 控件不会被其他线程直接访问。
+高频的状态类事件（如进度）可以按键合并，每帧只处理最新的一条。
+有新事件时通过虚拟事件唤醒界面线程，空闲时不需要定时轮询；
+Tcl 未启用线程支持时 Tk 不能被其他线程调用，退回到主循环中定时检查。
+"""
+
+import logging
+import queue
+import threading
+import time
+
+# 通知界面线程有新事件的 Tk 虚拟事件
+WAKEUP_EVENT = '<<UIEvents>>'
+
+# Tcl 未启用线程支持时，主循环检查新事件的间隔（毫秒）
+FALLBACK_POLL_MS = 50
+
+
+class UIEventQueue(queue.Queue):
+    """工作线程 -> 界面线程的事件队列
+
+    put((类型, 参数...))    普通事件，按发布顺序全部处理
+    put_latest(键, 事件)    可合并的事件，同一个键在一帧内只保留最新的一条
+    call(函数, 参数...)     在界面线程中执行函数，事件类型为 'call'
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._latest_lock = threading.Lock()
+        self._latest = {}
+        self._wakeup = None
+        self._signal = threading.Event()
+        self._closed = False
+
+    def _put(self, item):
+        super()._put(item)
+        self._signal.set()
+
+    def put_latest(self, key, event):
+        with self._latest_lock:
+            self._latest[key] = event
+        self._signal.set()
+
+    def call(self, func, *args):
+        self.put(('call', func, args))
+
+    def pending(self):
+        """待处理的事件数"""
+        with self._latest_lock:
+            return self.qsize() + len(self._latest)
+
+    def set_wakeup(self, wakeup):
+        """注册唤醒函数，有新事件时由后台唤醒线程调用
+
+        发布事件的线程只设置标志，不会因界面线程繁忙而阻塞；唤醒之前连续发布的事件只触发一次唤醒。
+        """
+        self._wakeup = wakeup
+        threading.Thread(target=self._wakeup_loop, name='ui-wakeup', daemon=True).start()
+
+    def bind_tk(self, root, handler):
+        """有新事件时在 Tk 主循环中调用 handler()，主窗口销毁后停止唤醒
+
+        唤醒线程调用 event_generate 依赖启用线程支持的 Tcl（tcl_platform(threaded)，
+        python.org 安装包和主流发行版均已启用）：Tkinter 会把调用转交给主循环所在线程执行。
+        未启用时跨线程调用 Tk 会出错，改为每 FALLBACK_POLL_MS 毫秒在主循环中检查一次。
+        """
+        # 子控件销毁时 <Destroy> 也会传到主窗口的绑定上，只处理主窗口本身
+        root.bind('<Destroy>', lambda event: self.close() if event.widget is root else None, add='+')
+        if not _tcl_threaded(root):
+            self._poll_tk(root, handler)
+            return
+        root.bind(WAKEUP_EVENT, lambda event: handler())
+        self.set_wakeup(lambda: root.event_generate(WAKEUP_EVENT, when='tail'))
+
+    def _poll_tk(self, root, handler):
+        """在主循环中定时检查唤醒标志，有新事件时调用 handler()"""
+        if self._closed:
+            return
+        if self._signal.is_set():
+            self._signal.clear()
+            handler()
+        root.after(FALLBACK_POLL_MS, self._poll_tk, root, handler)
+
+    def close(self):
+        """停止后台唤醒线程（窗口已销毁）"""
+        self._closed = True
+        self._signal.set()
+
+    def _wakeup_loop(self):
+        failing = False
+        while True:
+            self._signal.wait()
+            self._signal.clear()
+            if self._closed:
+                return
+            try:
+                self._wakeup()
+                failing = False
+            except RuntimeError:
+                # 主循环尚未启动，稍后重试
+                self._signal.set()
+                time.sleep(0.1)
+            except Exception as e:
+                if self._closed:
+                    return
+                # 没有定时轮询，唤醒线程退出后界面不再处理任何事件：记录错误（连续失败只记录一次）后重试
+                if not failing:
+                    logging.getLogger(__name__).warning(f"唤醒界面线程失败，稍后重试: {e}")
+                    failing = True
+                self._signal.set()
+                time.sleep(0.1)
+
+    def drain(self, budget_ms=None, max_events=None):
+        """在界面线程中调用：先取出合并后的事件，再按顺序取出普通事件，超出时间或数量预算时停止"""
+        with self._latest_lock:
+            latest, self._latest = self._latest, {}
+        yield from latest.values()
+
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+        count = 0
+        while max_events is None or count < max_events:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            try:
+                event = self.get_nowait()
+            except queue.Empty:
+                return
+            count += 1
+            yield event
+
+
+def _tcl_threaded(root):
+    """Tcl 是否启用了线程支持（未启用时没有 tcl_platform(threaded) 变量）"""
+    return bool(root.tk.call('info', 'exists', 'tcl_platform(threaded)'))
+
+
+def in_main_thread():
+    """当前是否为界面（主）线程"""
+    return threading.current_thread() is threading.main_thread()
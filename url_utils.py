@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube 链接规范化
+把各种形式的链接（watch、youtu.be、shorts、live、embed、YouTube Music、播放列表、频道）
+统一映射为 (类型, ID) 键，供链接校验、去重、缓存和下载共用。
+全部使用预编译的正则表达式，不经过 urlparse/parse_qs，批量粘贴十万行也能在瞬间处理完。
+"""
+
+import re
+from collections import namedtuple
+
+# kind: 'video' / 'playlist' / 'channel'
+# id: 视频ID、播放列表ID或频道标识（@handle、channel/UC...、c/name、user/name）
+# list_id: 视频链接附带的播放列表ID（如 YouTube Music 的 RD 自动播放列表），没有时为 None
+UrlKey = namedtuple('UrlKey', ('kind', 'id', 'list_id'))
+
+# 协议可省略；www./m./music. 子域名统一处理
+_URL_RE = re.compile(
+    r'^\s*(?:https?://)?(?:www\.|m\.|music\.)?'
+    r'(?P<host>youtube\.com|youtube-nocookie\.com|youtu\.be)(?::\d+)?'
+    r'(?P<path>/[^?#\s]*)?(?:\?(?P<query>[^#\s]*))?(?:#\S*)?\s*$',
+    re.IGNORECASE)
+
+_VIDEO_ID = r'[A-Za-z0-9_-]{11}'
+_SHORT_PATH_RE = re.compile(rf'^/({_VIDEO_ID})(?:/|$)')
+_VIDEO_PATH_RE = re.compile(rf'^/(?:shorts|live|embed|v|e)/({_VIDEO_ID})(?:/|$)')
+_CHANNEL_PATH_RE = re.compile(r'^/(@[^/]+|channel/[A-Za-z0-9_-]+|c/[^/]+|user/[^/]+)')
+_CHANNEL_TAB_RE = re.compile(_CHANNEL_PATH_RE.pattern + r'/([A-Za-z]+)')
+_V_PARAM_RE = re.compile(rf'(?:^|[&;])v=({_VIDEO_ID})(?=$|[&;#])')
+_LIST_PARAM_RE = re.compile(r'(?:^|[&;])list=([A-Za-z0-9_-]+)')
+
+
+def parse_youtube_url(url):
+    """把链接解析为 UrlKey，不是可识别的 YouTube 链接时返回 None"""
+    match = _URL_RE.match(url)
+    if match is None:
+        return None
+
+    host = match.group('host').lower()
+    path = match.group('path') or '/'
+    query = match.group('query') or ''
+
+    list_match = _LIST_PARAM_RE.search(query) if 'list=' in query else None
+    list_id = list_match.group(1) if list_match else None
+
+    if host == 'youtu.be':
+        video = _SHORT_PATH_RE.match(path)
+        return UrlKey('video', video.group(1), list_id) if video else None
+
+    if path in ('/watch', '/watch/'):
+        video = _V_PARAM_RE.search(query)
+        if video:
+            return UrlKey('video', video.group(1), list_id)
+        return UrlKey('playlist', list_id, None) if list_id else None
+
+    video = _VIDEO_PATH_RE.match(path)
+    if video:
+        return UrlKey('video', video.group(1), list_id)
+
+    if path.startswith('/playlist'):
+        return UrlKey('playlist', list_id, None) if list_id else None
+
+    channel = _CHANNEL_PATH_RE.match(path)
+    if channel:
+        return UrlKey('channel', channel.group(1), None)
+
+    return None
+
+
+def is_youtube_url(url):
+    """是否为可识别的 YouTube 视频、播放列表或频道链接"""
+    return parse_youtube_url(url) is not None
+
+
+def canonical_url(key):
+    """UrlKey 对应的标准链接（视频链接不带播放列表和跟踪参数）"""
+    if key.kind == 'video':
+        return f"https://www.youtube.com/watch?v={key.id}"
+    if key.kind == 'playlist':
+        return f"https://www.youtube.com/playlist?list={key.id}"
+    return f"https://www.youtube.com/{key.id}"
+
+
+def channel_tab(url):
+    """频道链接中的标签页（如 'videos'、'shorts'、'streams'），不是频道链接或没有标签页时返回 None"""
+    match = _URL_RE.match(url)
+    if match is None:
+        return None
+    tab = _CHANNEL_TAB_RE.match(match.group('path') or '/')
+    return tab.group(2).lower() if tab else None
+
+
+def source_key(url, key):
+    """区分下载来源的键：单个视频为 ('video', ID)；
+    播放列表、频道以及附带播放列表的视频链接为 (类型, ID, 播放列表ID, 频道标签页)，
+    同一频道的不同标签页、同一视频所在的不同播放列表不会被合并
+    """
+    if key.kind == 'video' and key.list_id is None:
+        return key[:2]
+    return (key.kind, key.id, key.list_id, channel_tab(url) if key.kind == 'channel' else None)
+
+
+def video_id_of(url):
+    """链接中的视频ID，不是视频链接时返回 None"""
+    key = parse_youtube_url(url)
+    return key.id if key and key.kind == 'video' else None
+
+
+def normalize_urls(lines):
+    """批量规范化粘贴的多行文本，返回 [(原始行, UrlKey), ...]
+
+    跳过空行和无法识别的行，保持输入顺序。
+    """
+    parse = parse_youtube_url
+    result = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            key = parse(line)
+            if key is not None:
+                result.append((line, key))
+    return result
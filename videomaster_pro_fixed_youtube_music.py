@@ -20,6 +20,8 @@ import subprocess
 import platform
 import traceback
 
+from url_utils import parse_youtube_url, is_youtube_url, canonical_url
+
 class VideoMasterProFixedApp:
     def __init__(self, root):
         self.root = root
@@ -163,61 +165,25 @@ class VideoMasterProFixedApp:
         self.log_text.tag_config("ERROR", foreground="red")
     
     def validate_url_improved(self, url):
-        """改进的URL验证函数"""
-        try:
-            parsed = urlparse(url)
-            
-            # 检查基本URL结构
-            if not all([parsed.scheme, parsed.netloc]):
-                return False
-            
-            # 检查是否是YouTube域名
-            youtube_domains = [
-                'youtube.com', 'www.youtube.com', 
-                'youtu.be', 'www.youtu.be',
-                'music.youtube.com'
-            ]
-            
-            if parsed.netloc.lower() not in youtube_domains:
-                return False
-            
-            # 对于YouTube链接，检查是否包含视频ID
-            if 'youtube.com' in parsed.netloc:
-                query_params = parse_qs(parsed.query)
-                # 检查watch页面或embed页面
-                if '/watch' in parsed.path and 'v' in query_params:
-                    return True
-                elif '/embed/' in parsed.path:
-                    return True
-                elif '/playlist' in parsed.path and 'list' in query_params:
-                    return True
-            elif 'youtu.be' in parsed.netloc:
-                # youtu.be短链接格式
-                return len(parsed.path) > 1
-            
-            return True
-            
-        except Exception:
-            return False
+        """改进的URL验证函数（视频、播放列表、频道链接）"""
+        return is_youtube_url(url)
     
     def extract_clean_url(self, url):
-        """从复杂的YouTube链接中提取干净的视频URL"""
-        try:
-            parsed = urlparse(url)
-            query_params = parse_qs(parsed.query)
-            
-            # 如果是播放列表链接但包含视频ID，提取单个视频
-            if 'list' in query_params and 'v' in query_params:
-                video_id = query_params['v'][0]
-                clean_url = f"https://www.youtube.com/watch?v={video_id}"
-                self._append_log(f"检测到播放列表链接，提取单视频: {video_id}", "INFO")
-                return clean_url
-            
-            return url
-            
-        except Exception as e:
-            self._append_log(f"URL处理错误: {e}", "WARNING")
+        """从复杂的YouTube链接中提取干净的视频URL（去掉播放列表和跟踪参数）"""
+        key = parse_youtube_url(url)
+        if key is None or key.kind != 'video':
             return url
+        
+        # 如果是播放列表链接但包含视频ID，提取单个视频
+        if key.list_id:
+            # 检查是否是YouTube Music自动播放列表
+            if key.list_id.startswith('RD'):
+                self._append_log("🎵 检测到YouTube Music自动播放列表", "INFO")
+            else:
+                self._append_log(f"📋 检测到普通播放列表: {key.list_id}", "INFO")
+            self._append_log(f"🎯 提取单个视频ID: {key.id}", "SUCCESS")
+        
+        return canonical_url(key)
     
     def get_enhanced_ydl_opts(self, proxy=None):
         """获取增强的yt-dlp配置"""
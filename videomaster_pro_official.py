@@ -12,15 +12,89 @@ from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
 import queue
 import logging
+import logging.handlers
+import atexit
 from urllib.parse import urlparse, parse_qs
 import os
 from datetime import datetime
-import json
 import subprocess
 import platform
 import traceback
+import copy
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from download_archive import DownloadArchive
+from download_tasks import DownloadTask, DownloadCancelled, CancellationToken, track_child_processes, collect_child_processes, kill_processes
+from batch_planner import ThroughputMeter, plan_batch, fit_to_budget, quality_score, format_bytes, format_duration
+from format_selector import FormatConstraints, select_format, format_options
+from history_store import HistoryStore
+from fragment_tuner import FragmentConcurrencyTuner, FragmentSession
+from info_cache import InfoCache, slim_info
+from job_journal import JobJournal, FINISHED_STATES
+from resource_utils import get_data_dir
+from sync_state import SyncState
+from ui_dispatch import UIEventQueue, in_main_thread
+from url_utils import parse_youtube_url, is_youtube_url, canonical_url, channel_tab, source_key, video_id_of, normalize_urls
+from virtual_list import VirtualListModel, VirtualTreeview
+from ydl_pool import YDLPool
+
+# ffmpeg 合并/转换和外部下载器的子进程按线程登记，停止下载时直接结束
+track_child_processes(yt_dlp.postprocessor.ffmpeg, yt_dlp.downloader.external)
+
+
+class ResolvedFormatRecorder(yt_dlp.postprocessor.PostProcessor):
+    """下载开始前回调已选定格式的 info_dict（before_dl 阶段）"""
+    
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+    
+    def run(self, info):
+        self.callback(info)
+        return [], info
+
 
 class VideoMasterProOfficialApp:
+    # 内存中完整视频信息的上限（MB），超出后按最久未使用淘汰，磁盘缓存不受影响
+    INFO_CACHE_MEMORY_MB = 64
+    # 批量链接预解析的并发数和输入防抖延迟（毫秒）
+    PREFETCH_WORKERS = 4
+    PREFETCH_DELAY_MS = 800
+    # 修改存储预算、格式ID或收到预解析结果后重新预估的防抖延迟（毫秒）
+    PLAN_REFRESH_DELAY_MS = 300
+    # 下载进度的界面刷新帧率（次/秒），与下载速度和任务数无关
+    PROGRESS_FPS = 4
+    # 任务进度表的列和状态名称
+    PROGRESS_COLUMNS = ("任务", "标题", "进度", "已下载", "速度", "剩余", "状态")
+    STATUS_LABELS = {'queued': '排队', 'extracting': '解析中', 'downloading': '下载中', 'merging': '合并中',
+                     'done': '完成', 'failed': '失败', 'cancelled': '已取消'}
+    # 每次处理结果队列的时间预算（毫秒）和消息数上限，以及有积压时继续处理的间隔（毫秒）
+    RESULTS_BUDGET_MS = 15
+    RESULTS_MAX_MESSAGES = 200
+    RESULTS_BACKLOG_INTERVAL_MS = 10
+    # 日志窗口最多保留的行数，超出后一次删除 LOG_TRIM_LINES 行；完整日志写入滚动日志文件
+    LOG_MAX_LINES = 2000
+    LOG_TRIM_LINES = 500
+    LOG_FILE_MAX_MB = 5
+    LOG_FILE_BACKUPS = 5
+    # 打开下载历史时等待后台写入完成的最长时间（秒）
+    HISTORY_FLUSH_TIMEOUT = 2
+    # 播放列表/频道展开时，队列中最多预先排队的任务数（背压）
+    PLAYLIST_QUEUE_AHEAD = 20
+    # 展开时每次加入队列的视频数（一次去重检查和一次任务日志事务）
+    PLAYLIST_ENQUEUE_CHUNK = 50
+    # 默认格式选择语句，以及格式偏好中的编码选项 -> (视频编码, 音频编码, 容器)
+    DEFAULT_FORMAT = "bv*+ba/b"
+    CODEC_PREFERENCES = {
+        '不限': ((), (), None),
+        '兼容优先 (H.264)': (('avc1',), ('mp4a',), 'mp4'),
+        'VP9': (('vp9',), ('opus',), None),
+        'AV1': (('av01', 'vp9'), ('opus',), None),
+    }
+    
     def __init__(self, root):
         self.root = root
         self.root.title("VideoMaster Pro - 正式版 v2.0")
@@ -51,27 +125,96 @@ class VideoMasterProOfficialApp:
         
         # 初始化变量
         self.download_queue = queue.Queue()
-        self.result_queue = queue.Queue()
-        self.download_tasks = []
-        self.current_task_index = 0
+        # 工作线程只向结果队列发布事件，由 process_results 在界面线程中统一更新控件
+        self.result_queue = UIEventQueue()
+        # 排队中和进行中的任务（任务ID -> 任务），任务结束后移除；结束的任务只计入下面的计数
+        self.download_tasks = {}
         self.total_tasks = 0
-        self.abort_all_tasks = False
-        self.video_info = {}
-        self.is_downloading = False
+        self.finished_tasks = 0
+        self.failed_tasks = 0
+        self.cancelled_tasks = 0
+        # 本批统计是否已输出（停止下载和任务结束都可能触发）
+        self.batch_reported = False
+        self.video_info = InfoCache(os.path.join(get_data_dir(), 'info_cache'),
+                                    max_memory_bytes=self.INFO_CACHE_MEMORY_MB * 1024 * 1024)
         self.download_threads = {}
+        
+        # 复用 YoutubeDL 实例（保留连接和提取器缓存）
+        self.ydl_pool = YDLPool()
+        
+        # 并行下载任务池（与分片线程数相互独立）
+        self.max_workers = 3
+        self.active_tasks = {}
+        self.task_lock = threading.Lock()
+        self.worker_slots = threading.Condition(self.task_lock)
+        self.queue_space = threading.Condition(self.task_lock)
+        self.task_counter = 0
+        
+        # 下载历史写入失败时只提示一次（多个工作线程可能同时失败）
+        self.history_lock = threading.Lock()
+        self.history_error_shown = False
+        
+        # 正在展开的播放列表/频道（取消令牌）
+        self.expansions = set()
+        
+        # 去重索引：规范化链接键 -> 排队中或进行中的任务，同一视频不会重复下载
+        self.task_index = {}
+        # 跳过下载存档中已完成的视频
+        self.skip_archived = True
+        
+        # 分片并发自适应调节（线程数选择“自动”时使用）
+        self.fragment_tuner = FragmentConcurrencyTuner()
+        
+        # 批量链接后台预解析
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=self.PREFETCH_WORKERS, thread_name_prefix='prefetch')
+        self.prefetch_lock = threading.Lock()
+        self.prefetch_wanted = set()
+        self.prefetch_inflight = set()
+        self.prefetch_rows = {}
+        self.prefetch_after_id = None
+        self.prefetch_summaries = {}
+        
+        # 进度表中每个任务行（以任务ID为行ID）当前显示的单元格内容；只在有进行中的任务时定时采样
+        self.progress_rows = {}
+        self.progress_after_id = None
+        
+        # 结果队列处理统计（队列深度、单次处理耗时）；只在有新事件或积压时处理
+        self.results_after_id = None
+        self.results_stats = {'ticks': 0, 'messages': 0, 'max_depth': 0, 'max_tick_ms': 0.0,
+                              'avg_tick_ms': 0.0, 'backlog_ticks': 0}
+        self.results_reported_at = time.time()
+        
+        # 批量大小/完成时间预估
+        self.throughput_meter = ThroughputMeter()
+        self.plan_refreshed_at = 0
+        self.plan_after_id = None
+        # 每个预解析链接的预估缓存：按大小排序的分辨率档位、按当前格式设置的预计大小；
+        # 以及最近一次预算分配 ((预算, 链接), 分配结果)。格式偏好或格式ID变化时清除
+        self.plan_options = {}
+        self.plan_sizes = {}
+        self.plan_assigned = None
         self.last_formats_data = None
-        self.download_history = []
+        self.formats_list_cache = None
         
         self.setup_logging()
         self.create_widgets()
-        self.load_download_history()
+        self.history_store = self.open_history_store()
+        self.download_archive = self.open_download_archive()
+        self.sync_state = SyncState(os.path.join(get_data_dir(), 'sync_state.json'))
+        self.job_journal = self.open_job_journal()
+        threading.Thread(target=self.video_info.purge_expired, daemon=True).start()
         
         # 启动处理线程
         self.processing_thread = threading.Thread(target=self.process_queue, daemon=True)
         self.processing_thread.start()
         
-        # 启动结果处理
+        # 恢复上次未完成的任务
+        self.resume_pending_jobs()
+        
+        # 有新事件时由工作线程唤醒结果处理，不再定时轮询
+        self.result_queue.bind_tk(self.root, self.process_results)
         self.process_results()
+        self.sample_progress()
         
         # 绑定鼠标滚轮事件
         self.bind_mousewheel()
@@ -101,6 +244,27 @@ class VideoMasterProOfficialApp:
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         self.log_handler.setFormatter(formatter)
         self.logger.addHandler(self.log_handler)
+        
+        # 完整日志由后台线程写入滚动日志文件，界面线程只负责入队
+        self.log_lines = 0
+        self.log_file_path = os.path.join(get_data_dir(), 'logs', 'videomaster.log')
+        self.file_logger = logging.getLogger(f"{__name__}.file")
+        self.file_logger.setLevel(logging.INFO)
+        self.file_logger.propagate = False
+        try:
+            os.makedirs(os.path.dirname(self.log_file_path), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                self.log_file_path, maxBytes=self.LOG_FILE_MAX_MB * 1024 * 1024,
+                backupCount=self.LOG_FILE_BACKUPS, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter('%(asctime)s [%(tag)s] %(message)s'))
+            spill_queue = queue.SimpleQueue()
+            self.file_logger.addHandler(logging.handlers.QueueHandler(spill_queue))
+            self.log_listener = logging.handlers.QueueListener(spill_queue, file_handler)
+            self.log_listener.start()
+            atexit.register(self.log_listener.stop)
+        except OSError as e:
+            self.log_listener = None
+            self.logger.error(f"无法创建日志文件: {str(e)}")
     
     def create_card(self, parent, title, **kwargs):
         """创建卡片样式的框架"""
@@ -173,6 +337,15 @@ class VideoMasterProOfficialApp:
         
         self.urls_text = scrolledtext.ScrolledText(batch_frame, height=4, font=('SF Pro Display', 9))
         self.urls_text.pack(fill=tk.BOTH, expand=True)
+        self.urls_text.bind("<<Modified>>", self.on_urls_modified)
+        
+        # 批量链接预览（输入后自动在后台解析）
+        preview_columns = ("链接", "标题", "时长", "预计大小", "状态")
+        self.prefetch_tree = ttk.Treeview(batch_frame, columns=preview_columns, show="headings", height=4)
+        for col, width in zip(preview_columns, (220, 320, 70, 90, 70)):
+            self.prefetch_tree.heading(col, text=col)
+            self.prefetch_tree.column(col, width=width, anchor=tk.W)
+        self.prefetch_tree.pack(fill=tk.X, pady=(5, 0))
         
         # 2. 网络设置区域
         network_card, network_content = self.create_card(main_container, "🌐 网络设置")
@@ -230,11 +403,53 @@ class VideoMasterProOfficialApp:
         tk.Label(format_frame, text="格式ID:", font=('SF Pro Display', 10),
                 bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 10))
         
-        self.format_id_var = tk.StringVar(value="bv*+ba/b")
+        self.format_id_var = tk.StringVar(value=self.DEFAULT_FORMAT)
         format_entry = tk.Entry(format_frame, textvariable=self.format_id_var, font=('SF Pro Display', 10), relief='solid', bd=1)
         format_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
         format_entry.bind("<Double-Button-1>", self.reopen_formats_window)
         
+        # 格式偏好（推荐格式和默认格式选择语句按此生成）
+        prefs_frame = tk.Frame(download_content, bg=self.colors['card'])
+        prefs_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        tk.Label(prefs_frame, text="最高分辨率:", font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.max_height_var = tk.StringVar(value="不限")
+        height_combo = ttk.Combobox(prefs_frame, textvariable=self.max_height_var, width=6, state='readonly')
+        height_combo['values'] = ['不限', '2160', '1440', '1080', '720', '480', '360']
+        height_combo.pack(side=tk.LEFT, padx=(0, 20))
+        
+        tk.Label(prefs_frame, text="帧率上限:", font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.max_fps_var = tk.StringVar(value="不限")
+        fps_combo = ttk.Combobox(prefs_frame, textvariable=self.max_fps_var, width=6, state='readonly')
+        fps_combo['values'] = ['不限', '60', '30']
+        fps_combo.pack(side=tk.LEFT, padx=(0, 20))
+        
+        tk.Label(prefs_frame, text="编码偏好:", font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.codec_pref_var = tk.StringVar(value="不限")
+        codec_combo = ttk.Combobox(prefs_frame, textvariable=self.codec_pref_var, width=16, state='readonly')
+        codec_combo['values'] = list(self.CODEC_PREFERENCES)
+        codec_combo.pack(side=tk.LEFT, padx=(0, 20))
+        
+        # 存储预算模式：为整批视频分配分辨率，使总大小不超过预算
+        tk.Label(prefs_frame, text="存储预算(GB):", font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.budget_var = tk.StringVar()
+        tk.Entry(prefs_frame, textvariable=self.budget_var, width=8, font=('SF Pro Display', 10),
+                relief='solid', bd=1).pack(side=tk.LEFT)
+        self.budget_var.trace_add('write', self.schedule_batch_plan)
+        
+        self.auto_format_spec = self.DEFAULT_FORMAT
+        self.format_id_var.trace_add('write', self.on_format_id_changed)
+        for var in (self.max_height_var, self.max_fps_var, self.codec_pref_var):
+            var.trace_add('write', self.on_format_prefs_changed)
+        
         # 其他设置
         options_frame = tk.Frame(download_content, bg=self.colors['card'])
         options_frame.pack(fill=tk.X, pady=(0, 10))
@@ -243,15 +458,38 @@ class VideoMasterProOfficialApp:
         self.subtitle_var = tk.BooleanVar()
         ttk.Checkbutton(options_frame, text="下载字幕", variable=self.subtitle_var).pack(side=tk.LEFT, padx=(0, 20))
         
+        # 跳过下载存档中已下载过的视频
+        self.skip_archived_var = tk.BooleanVar(value=self.skip_archived)
+        ttk.Checkbutton(options_frame, text="跳过已下载", variable=self.skip_archived_var).pack(side=tk.LEFT, padx=(0, 20))
+        self.skip_archived_var.trace_add('write', lambda *args: setattr(self, 'skip_archived', self.skip_archived_var.get()))
+        
+        # 播放列表/频道模式
+        self.playlist_mode_var = tk.BooleanVar()
+        ttk.Checkbutton(options_frame, text="播放列表/频道", variable=self.playlist_mode_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 增量同步：频道只获取上次同步之后的新视频
+        self.sync_mode_var = tk.BooleanVar()
+        ttk.Checkbutton(options_frame, text="增量同步", variable=self.sync_mode_var).pack(side=tk.LEFT, padx=(0, 20))
+        
         # 线程数
         tk.Label(options_frame, text="线程数:", font=('SF Pro Display', 10),
                 bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 5))
         
         self.threads_var = tk.StringVar(value="4")
         threads_combo = ttk.Combobox(options_frame, textvariable=self.threads_var, width=5)
-        threads_combo['values'] = ['1', '2', '4', '8', '16']
+        threads_combo['values'] = ['1', '2', '4', '8', '16', '自动']
         threads_combo.pack(side=tk.LEFT, padx=(0, 20))
         
+        # 并行任务数
+        tk.Label(options_frame, text="并行任务:", font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.workers_var = tk.StringVar(value=str(self.max_workers))
+        workers_combo = ttk.Combobox(options_frame, textvariable=self.workers_var, width=5)
+        workers_combo['values'] = ['1', '2', '3', '4', '6', '8']
+        workers_combo.pack(side=tk.LEFT, padx=(0, 20))
+        self.workers_var.trace_add('write', self.on_workers_changed)
+        
         # 转码选项
         self.transcode_var = tk.BooleanVar()
         ttk.Checkbutton(options_frame, text="转码", variable=self.transcode_var).pack(side=tk.LEFT, padx=(0, 10))
@@ -272,6 +510,24 @@ class VideoMasterProOfficialApp:
         self.create_button(control_btn_frame, "⏹️ 停止下载", self.stop_download, self.colors['danger']).pack(side=tk.LEFT, padx=(0, 10))
         self.create_button(control_btn_frame, "📜 下载历史", self.show_history, self.colors['secondary']).pack(side=tk.LEFT, padx=(0, 10))
         self.create_button(control_btn_frame, "🗑️ 清空日志", self.clear_logs, self.colors['text_secondary']).pack(side=tk.RIGHT)
+        self.create_button(control_btn_frame, "📄 完整日志", self.open_full_log, self.colors['text_secondary']).pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 下载进度（按固定帧率采样所有进行中任务的进度）
+        self.progress_var = tk.StringVar(value="⬇️ 当前没有进行中的下载")
+        tk.Label(control_content, textvariable=self.progress_var, font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text']).pack(anchor=tk.W, pady=(10, 0))
+        
+        # 进行中任务的进度表（每个任务一行）
+        self.progress_tree = ttk.Treeview(control_content, columns=self.PROGRESS_COLUMNS, show="headings", height=4)
+        for col, width in zip(self.PROGRESS_COLUMNS, (50, 300, 60, 150, 90, 70, 70)):
+            self.progress_tree.heading(col, text=col)
+            self.progress_tree.column(col, width=width, anchor=tk.W)
+        self.progress_tree.pack(fill=tk.X, pady=(5, 0))
+        
+        # 批量预估（总大小、磁盘空间、预计完成时间）
+        self.plan_var = tk.StringVar(value="📦 批量预估: 暂无链接")
+        tk.Label(control_content, textvariable=self.plan_var, font=('SF Pro Display', 10),
+                bg=self.colors['card'], fg=self.colors['text_secondary']).pack(anchor=tk.W, pady=(10, 0))
         
         # 6. 日志区域
         log_card, log_content = self.create_card(main_container, "📋 运行日志")
@@ -319,60 +575,29 @@ class VideoMasterProOfficialApp:
         return color_map.get(color, color)
     
     def validate_url_improved(self, url):
-        """改进的URL验证函数"""
-        try:
-            parsed = urlparse(url)
-            
-            # 检查基本URL结构
-            if not all([parsed.scheme, parsed.netloc]):
-                return False
-            
-            # 检查是否是YouTube域名
-            youtube_domains = [
-                'youtube.com', 'www.youtube.com', 
-                'youtu.be', 'www.youtu.be',
-                'music.youtube.com', 'm.youtube.com'
-            ]
-            
-            if parsed.netloc.lower() not in youtube_domains:
-                return False
-            
-            return True
-            
-        except Exception:
-            return False
+        """改进的URL验证函数（视频、播放列表、频道链接）"""
+        return is_youtube_url(url)
     
     def validate_url(self, url):
         """兼容原版的URL验证"""
         return self.validate_url_improved(url)
     
     def extract_clean_url(self, url):
-        """从复杂的YouTube链接中提取干净的视频URL"""
-        try:
-            parsed = urlparse(url)
-            query_params = parse_qs(parsed.query)
-            
-            # 如果是播放列表链接但包含视频ID，提取单个视频
-            if 'list' in query_params and 'v' in query_params:
-                video_id = query_params['v'][0]
-                clean_url = f"https://www.youtube.com/watch?v={video_id}"
-                
-                # 检查是否是YouTube Music自动播放列表
-                list_id = query_params['list'][0]
-                if list_id.startswith('RD'):
-                    self._append_log(f"🎵 检测到YouTube Music自动播放列表", "INFO")
-                    self._append_log(f"🎯 提取单个视频ID: {video_id}", "SUCCESS")
-                else:
-                    self._append_log(f"📋 检测到普通播放列表: {list_id}", "INFO")
-                    self._append_log(f"🎯 提取单个视频ID: {video_id}", "SUCCESS")
-                
-                return clean_url
-            
-            return url
-            
-        except Exception as e:
-            self._append_log(f"URL处理错误: {e}", "WARNING")
+        """从复杂的YouTube链接中提取干净的视频URL（去掉播放列表和跟踪参数）"""
+        key = parse_youtube_url(url)
+        if key is None or key.kind != 'video':
             return url
+        
+        # 如果是播放列表链接但包含视频ID，提取单个视频
+        if key.list_id:
+            # 检查是否是YouTube Music自动播放列表
+            if key.list_id.startswith('RD'):
+                self.result_queue.put(('info', "🎵 检测到YouTube Music自动播放列表"))
+            else:
+                self.result_queue.put(('info', f"📋 检测到普通播放列表: {key.list_id}"))
+            self.result_queue.put(('success', f"🎯 提取单个视频ID: {key.id}"))
+        
+        return canonical_url(key)
     
     def analyze_link(self):
         """分析链接结构"""
@@ -392,6 +617,10 @@ class VideoMasterProOfficialApp:
             self._append_log(f"🌐 域名: {parsed.netloc}", "INFO")
             self._append_log(f"📂 路径: {parsed.path}", "INFO")
             
+            key = parse_youtube_url(url)
+            if key is not None:
+                self._append_log(f"🔑 规范化: {key.kind} {key.id} → {canonical_url(key)}", "INFO")
+            
             if query_params:
                 self._append_log("📋 查询参数:", "INFO")
                 for key, value in query_params.items():
@@ -423,8 +652,14 @@ class VideoMasterProOfficialApp:
         except Exception as e:
             self._append_log(f"❌ 链接分析失败: {str(e)}", "ERROR")
     
-    def get_ydl_opts(self, proxy=None):
-        """获取yt-dlp配置"""
+    def get_proxy(self):
+        """当前生效的代理地址，未启用代理时返回 None（读取控件，只在界面线程中调用）"""
+        if not self.use_proxy.get():
+            return None
+        return self.proxy_entry.get().strip() or None
+    
+    def get_ydl_opts(self, proxy=None, log=True):
+        """获取yt-dlp配置（proxy 由调用方在界面线程中通过 get_proxy 取得）"""
         opts = {
             'quiet': True,
             'no_warnings': True,
@@ -440,14 +675,237 @@ class VideoMasterProOfficialApp:
         }
         
         # 代理设置
-        if self.use_proxy.get() and proxy:
+        if proxy:
             opts['proxy'] = proxy
-            self._append_log(f"🌐 使用代理: {proxy}", "INFO")
-        else:
-            self._append_log("🌐 使用直连", "INFO")
+            if log:
+                self.result_queue.put(('info', f"🌐 使用代理: {proxy}"))
+        elif log:
+            self.result_queue.put(('info', "🌐 使用直连"))
         
         return opts
     
+    def get_video_id(self, url):
+        """从链接中提取视频ID，无法识别时返回 None"""
+        return video_id_of(url)
+    
+    def get_video_info(self, url, proxy=None, ydl=None, log=True):
+        """获取视频信息，优先使用未过期的缓存
+        
+        返回经过 sanitize_info 处理的 info_dict，可直接交给 process_ie_result 下载。
+        """
+        video_id = self.get_video_id(url)
+        info = self.video_info.get(video_id)
+        if info is not None:
+            if log:
+                self.result_queue.put(('info', f"♻️ 使用缓存的视频信息: {video_id}"))
+            return info
+        
+        if ydl is None:
+            with self.ydl_pool.lease(self.get_ydl_opts(proxy, log=log)) as ydl:
+                info = ydl.extract_info(url, download=False)
+                info = ydl.sanitize_info(info, remove_private_keys=True)
+        else:
+            info = ydl.extract_info(url, download=False)
+            info = ydl.sanitize_info(info, remove_private_keys=True)
+        
+        self.video_info.put(info.get('id') or video_id, info)
+        return info
+    
+    def get_video_summary(self, url, proxy=None):
+        """获取界面使用的精简视频信息（标题、时长、作者、格式表）"""
+        summary = self.video_info.summary(self.get_video_id(url))
+        if summary is not None:
+            return summary
+        
+        info = self.get_video_info(url, proxy)
+        return self.video_info.summary(info.get('id')) or slim_info(info)
+    
+    def on_urls_modified(self, event=None):
+        """批量链接变化后防抖，停止输入一段时间后开始预解析"""
+        self.urls_text.edit_modified(False)
+        if self.prefetch_after_id:
+            self.root.after_cancel(self.prefetch_after_id)
+        self.prefetch_after_id = self.root.after(self.PREFETCH_DELAY_MS, self.start_prefetch)
+    
+    def start_prefetch(self):
+        """在后台并行解析批量链接的视频信息，结果写入视频信息缓存"""
+        self.prefetch_after_id = None
+        
+        urls = self.unique_urls(self.urls_text.get(1.0, tk.END).split('\n'))
+        
+        # 重建预览列表，已解析过的链接直接显示缓存结果；已下载过的视频不再解析，也不计入预估。
+        # 播放列表和频道只在下载时逐页展开，预解析会提取其中的全部视频
+        self.prefetch_tree.delete(*self.prefetch_tree.get_children())
+        self.prefetch_rows = {}
+        pending = []
+        for url in urls:
+            key = parse_youtube_url(url)
+            if key is None or key.kind != 'video':
+                self.prefetch_tree.insert("", "end", values=(url, "", "", "", "播放列表"))
+                continue
+            if self.is_archived(self.dedup_key(url)):
+                self.prefetch_tree.insert("", "end", values=(url, "", "", "", "已下载"))
+                continue
+            self.prefetch_rows[url] = self.prefetch_tree.insert("", "end", values=(url, "", "", "", "等待"))
+            pending.append(url)
+        urls = pending
+        self.prefetch_summaries = {url: summary for url, summary in self.prefetch_summaries.items() if url in self.prefetch_rows}
+        self.plan_options = {url: options for url, options in self.plan_options.items() if url in self.prefetch_rows}
+        self.plan_sizes = {url: size for url, size in self.plan_sizes.items() if url in self.prefetch_rows}
+        self.refresh_batch_plan()
+        
+        proxy = self.get_proxy()
+        with self.prefetch_lock:
+            # 已从输入框删除的链接不再解析
+            self.prefetch_wanted = set(urls)
+            submit = [url for url in urls if url not in self.prefetch_inflight]
+            self.prefetch_inflight.update(submit)
+        
+        for url in submit:
+            self.prefetch_pool.submit(self._prefetch_one, url, proxy)
+    
+    def _prefetch_one(self, url, proxy):
+        """预解析单个链接（在预解析线程池中执行）"""
+        try:
+            if url not in self.prefetch_wanted:
+                return
+            
+            clean_url = self.extract_clean_url(url)
+            summary = self.video_info.summary(self.get_video_id(clean_url))
+            if summary is None:
+                info = self.get_video_info(clean_url, proxy, log=False)
+                summary = self.video_info.summary(info.get('id')) or slim_info(info)
+            self.result_queue.put(('prefetch', url, summary, None))
+        
+        except Exception as e:
+            self.result_queue.put(('prefetch', url, None, str(e)))
+        finally:
+            with self.prefetch_lock:
+                self.prefetch_inflight.discard(url)
+    
+    def _update_prefetch_row(self, url, summary, error):
+        """在预览列表中显示预解析结果"""
+        item = self.prefetch_rows.get(url)
+        if item is None or not self.prefetch_tree.exists(item):
+            return
+        
+        if summary is None:
+            self.prefetch_tree.item(item, values=(url, error or "", "", "", "失败"))
+            return
+        self.prefetch_summaries[url] = summary
+        self.invalidate_batch_plan(url)
+        self.schedule_batch_plan()
+        
+        duration = summary.get('duration') or 0
+        minutes, seconds = divmod(int(duration), 60)
+        hours, minutes = divmod(minutes, 60)
+        duration_str = (f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}") if duration else "未知"
+        
+        size = self.planned_size(url)
+        size_str = f"{size / (1024*1024):.1f} MB" if size else "未知"
+        
+        self.prefetch_tree.item(item, values=(url, summary.get('title') or '', duration_str, size_str, "就绪"))
+    
+    def schedule_batch_plan(self, *args):
+        """防抖：连续输入或连续收到预解析结果时只在停止后重新预估一次"""
+        if self.plan_after_id:
+            self.root.after_cancel(self.plan_after_id)
+        self.plan_after_id = self.root.after(self.PLAN_REFRESH_DELAY_MS, self.refresh_batch_plan)
+    
+    def invalidate_batch_plan(self, url=None, options=True):
+        """清除预估缓存；指定 url 时只清除该链接，options 为 False 时保留分辨率档位"""
+        if url is not None:
+            self.plan_options.pop(url, None)
+            self.plan_sizes.pop(url, None)
+        else:
+            if options:
+                self.plan_options.clear()
+            self.plan_sizes.clear()
+        self.plan_assigned = None
+    
+    def planned_size(self, url):
+        """已预解析链接按当前格式设置的预计大小（缓存），无法估算时返回 0"""
+        size = self.plan_sizes.get(url)
+        if size is None:
+            summary = self.prefetch_summaries[url]
+            size = self.plan_sizes[url] = self.estimate_download_size(summary['format_table'], summary.get('duration'))
+        return size
+    
+    def refresh_batch_plan(self):
+        """批量预估（在界面线程中调用）
+        
+        下载过程中按已加入队列的任务（包括单个链接和播放列表展开的任务）估算剩余大小和完成时间；
+        空闲时汇总批量链接的预计大小，按最近测得的下载速度推算完成时间。
+        """
+        if self.plan_after_id:
+            self.root.after_cancel(self.plan_after_id)
+            self.plan_after_id = None
+        self.plan_refreshed_at = time.time()
+        
+        with self.task_lock:
+            tasks = list(self.download_tasks.values())
+        urls = list(self.prefetch_rows)
+        budget = None
+        if tasks:
+            needed, unknown = self.remaining_task_bytes(tasks)
+            text = f"📦 下载中: 剩余 {len(tasks)} 个任务, 约 {format_bytes(needed)}"
+        elif urls:
+            budget = self.get_storage_budget()
+            if budget:
+                # 预算模式按分配到的档位估算
+                assigned = self.plan_budget_formats(urls, budget)
+                plan = plan_batch([assigned.get(url) for url in urls], lambda choice: choice[1])
+            else:
+                plan = plan_batch([url if url in self.prefetch_summaries else None for url in urls], self.planned_size)
+            needed, unknown = plan.total_bytes, plan.unknown
+            text = f"📦 批量预估: {plan.count} 个视频, 约 {format_bytes(needed)}"
+        else:
+            self.plan_var.set("📦 批量预估: 暂无链接")
+            return
+        
+        if budget:
+            text += f" / 预算 {format_bytes(budget)}"
+            if needed > budget:
+                text += " ⚠️ 最低分辨率也超出预算"
+        if unknown:
+            text += f" ({unknown} 个未知)"
+        
+        try:
+            free = shutil.disk_usage(self.save_path_var.get()).free
+            text += f" · 磁盘剩余 {format_bytes(free)}"
+            if needed > free:
+                text += " ⚠️ 空间不足"
+        except OSError:
+            pass
+        
+        rate = self.throughput_meter.rate()
+        if not rate:
+            text += " · 完成时间: 等待测速"
+        else:
+            eta = needed / rate
+            finish_at = datetime.fromtimestamp(time.time() + eta).strftime("%H:%M")
+            text += f" · 预计 {format_duration(eta)}, 约 {finish_at} 完成"
+        self.plan_var.set(text)
+    
+    def remaining_task_bytes(self, tasks):
+        """排队中和进行中的任务剩余的预计字节数，返回 (字节数, 无法估算的任务数)
+        
+        任务的预计大小按缓存的视频信息和任务的格式语句估算（每个任务只估算一次）；
+        没有缓存信息的任务开始下载后改用下载进度中的总大小。
+        """
+        remaining = unknown = 0
+        for task in tasks:
+            if task.estimated_bytes is None:
+                summary = self.video_info.summary(video_id_of(task.url))
+                task.estimated_bytes = summary['format_table'].estimate_size(
+                    task.format_id, summary.get('duration')) if summary is not None else 0
+            total = task.estimated_bytes or task.total_bytes
+            if total:
+                remaining += max(total - task.downloaded_bytes, 0)
+            else:
+                unknown += 1
+        return remaining, unknown
+    
     def fetch_video_info(self):
         """获取视频信息"""
         url = self.url_entry.get().strip()
@@ -456,60 +914,50 @@ class VideoMasterProOfficialApp:
             messagebox.showerror("错误", "请输入有效的YouTube链接")
             return
         
-        self._append_log(f"🚀 开始获取视频信息...", "INFO")
+        self._append_log("🚀 开始获取视频信息...", "INFO")
+        proxy = self.get_proxy()
         
         def _fetch():
             try:
                 # 提取干净的URL
                 clean_url = self.extract_clean_url(url)
                 
-                # 获取配置
-                proxy = self.proxy_entry.get().strip() or None
-                ydl_opts = self.get_ydl_opts(proxy)
+                self.result_queue.put(('info', "🔄 正在连接YouTube服务器..."))
                 
-                self._append_log("🔄 正在连接YouTube服务器...", "INFO")
+                info = self.get_video_summary(clean_url, proxy)
+                
+                title = info.get('title') or '未知'
+                duration = info.get('duration') or 0
+                views = info.get('view_count') or 0
+                uploader = info.get('uploader') or '未知'
+                video_id = info.get('id') or '未知'
+                
+                # 格式化时长
+                if duration and isinstance(duration, (int, float)):
+                    hours, remainder = divmod(int(duration), 3600)
+                    minutes, seconds = divmod(remainder, 60)
+                    duration_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+                else:
+                    duration_str = "未知"
+                
+                # 格式化观看次数
+                views_str = f"{views:,}" if views and isinstance(views, (int, float)) else "未知"
+                
+                # 更新界面
+                self.result_queue.call(self._show_video_info, title, duration_str, views_str, uploader)
+                
+                self.result_queue.put(('success', "✅ 获取视频信息成功!"))
+                self.result_queue.put(('info', f"🎬 标题: {title}"))
+                self.result_queue.put(('info', f"🆔 视频ID: {video_id}"))
+                self.result_queue.put(('info', f"👤 作者: {uploader}"))
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(clean_url, download=False)
-                    
-                    title = info.get('title', '未知')
-                    duration = info.get('duration') or 0
-                    views = info.get('view_count') or 0
-                    uploader = info.get('uploader') or '未知'
-                    video_id = info.get('id') or '未知'
-                    
-                    # 格式化时长
-                    if duration and isinstance(duration, (int, float)):
-                        hours, remainder = divmod(int(duration), 3600)
-                        minutes, seconds = divmod(remainder, 60)
-                        duration_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
-                    else:
-                        duration_str = "未知"
-                    
-                    # 格式化观看次数
-                    views_str = f"{views:,}" if views and isinstance(views, (int, float)) else "未知"
-                    
-                    # 更新界面
-                    self.root.after(0, lambda: [
-                        self.title_var.set(f"标题: {title[:60]}{'...' if len(title) > 60 else ''}"),
-                        self.duration_var.set(f"时长: {duration_str}"),
-                        self.views_var.set(f"观看: {views_str}"),
-                        self.uploader_var.set(f"作者: {uploader}")
-                    ])
-                    
-                    self.video_info[clean_url] = info
-                    self.result_queue.put(('success', f"✅ 获取视频信息成功!"))
-                    self.result_queue.put(('info', f"🎬 标题: {title}"))
-                    self.result_queue.put(('info', f"🆔 视频ID: {video_id}"))
-                    self.result_queue.put(('info', f"👤 作者: {uploader}"))
-                    
             except Exception as e:
                 error_msg = str(e)
-                self.result_queue.put(('error', f"❌ 获取视频信息失败"))
+                self.result_queue.put(('error', "❌ 获取视频信息失败"))
                 
                 # 分析错误类型并给出建议
                 if "Unable to download API page" in error_msg or "Connection refused" in error_msg:
-                    if self.use_proxy.get():
+                    if proxy:
                         self.result_queue.put(('warning', "💡 代理连接失败，建议:"))
                         self.result_queue.put(('info', "   1. 检查代理软件是否运行"))
                         self.result_queue.put(('info', "   2. 尝试取消勾选代理选项"))
@@ -526,6 +974,13 @@ class VideoMasterProOfficialApp:
         
         threading.Thread(target=_fetch, daemon=True).start()
     
+    def _show_video_info(self, title, duration_str, views_str, uploader):
+        """在信息栏显示视频信息"""
+        self.title_var.set(f"标题: {title[:60]}{'...' if len(title) > 60 else ''}")
+        self.duration_var.set(f"时长: {duration_str}")
+        self.views_var.set(f"观看: {views_str}")
+        self.uploader_var.set(f"作者: {uploader}")
+    
     def query_formats(self):
         """查询可用格式并显示选择窗口"""
         url = self.url_entry.get().strip()
@@ -534,41 +989,31 @@ class VideoMasterProOfficialApp:
             return
         
         self._append_log("🔍 正在查询可用格式...", "INFO")
+        proxy = self.get_proxy()
+        constraints = self.get_format_constraints()
         
         def _query():
             try:
                 # 提取干净的URL
                 clean_url = self.extract_clean_url(url)
                 
-                proxy = self.proxy_entry.get().strip() or None
-                ydl_opts = self.get_ydl_opts(proxy)
+                info = self.get_video_summary(clean_url, proxy)
+                format_table = info['format_table']
+                
+                # 按格式偏好为所有组合打分，生成推荐格式及备选项
+                recommended_format = select_format(format_table, constraints, info.get('duration'))
+                
+                # 保存格式数据并显示窗口
+                title = info.get('title') or '未知标题'
+                self.last_formats_data = (title, format_table, recommended_format)
+                self.result_queue.call(self.show_formats_window, title, format_table, recommended_format)
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(clean_url, download=False)
-                    formats = info.get('formats', [])
-                    
-                    # 推荐格式计算
-                    video_formats = [f for f in formats if f.get('vcodec') != 'none' and f.get('acodec') == 'none' and f.get('height')]
-                    audio_formats = [f for f in formats if f.get('acodec') != 'none' and f.get('vcodec') == 'none' and f.get('abr')]
-                    
-                    recommended_format = None
-                    if video_formats and audio_formats:
-                        video_formats.sort(key=lambda f: f.get('height', 0), reverse=True)
-                        audio_formats.sort(key=lambda f: f.get('abr', 0), reverse=True)
-                        best_video = video_formats[0]
-                        best_audio = audio_formats[0]
-                        recommended_format = f"{best_video['format_id']}+{best_audio['format_id']}"
-                    
-                    # 保存格式数据并显示窗口
-                    self.last_formats_data = (info.get('title', '未知标题'), formats, recommended_format)
-                    self.root.after(0, lambda: self.show_formats_window(info.get('title', '未知标题'), formats, recommended_format))
-                    
             except Exception as e:
                 self.result_queue.put(('error', f"查询格式失败: {str(e)}"))
         
         threading.Thread(target=_query, daemon=True).start()
     
-    def show_formats_window(self, title, formats, recommended_format):
+    def show_formats_window(self, title, format_table, recommended_format):
         """显示格式选择窗口"""
         formats_window = tk.Toplevel(self.root)
         formats_window.title(f"格式选择 - {title[:50]}")
@@ -603,91 +1048,31 @@ class VideoMasterProOfficialApp:
                               bg=self.colors['bg'], fg=self.colors['text'])
         title_label.pack(pady=(0, 15))
         
-        # 创建表格
+        # 筛选
+        filter_var = self.create_filter_entry(main_frame)
+        
+        # 创建表格（只创建可见的行，点击列标题排序）
         columns = ("ID", "格式", "分辨率", "帧率", "视频编码", "音频编码", "大小(MB)", "备注")
-        tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=15)
-        
-        # 设置列标题和宽度
-        tree.heading("ID", text="ID")
-        tree.column("ID", width=80, anchor=tk.W)
-        tree.heading("格式", text="格式")
-        tree.column("格式", width=60, anchor=tk.CENTER)
-        tree.heading("分辨率", text="分辨率")
-        tree.column("分辨率", width=100)
-        tree.heading("帧率", text="帧率")
-        tree.column("帧率", width=60, anchor=tk.CENTER)
-        tree.heading("视频编码", text="视频编码")
-        tree.column("视频编码", width=120)
-        tree.heading("音频编码", text="音频编码")
-        tree.column("音频编码", width=120)
-        tree.heading("大小(MB)", text="大小(MB)")
-        tree.column("大小(MB)", width=100, anchor=tk.E)
-        tree.heading("备注", text="备注")
-        tree.column("备注", width=120)
-        
-        # 格式化文件大小
-        def format_size(size_in_bytes):
-            if size_in_bytes is None or not isinstance(size_in_bytes, (int, float)):
-                return "N/A"
-            try:
-                return f"{float(size_in_bytes) / (1024*1024):.1f}"
-            except (ValueError, TypeError):
-                return "N/A"
-        
-        # 添加数据
-        for f in sorted(formats, key=lambda x: (x.get('height', 0) or 0, x.get('fps', 0) or 0), reverse=True):
-            vcodec = f.get('vcodec', 'none')
-            acodec = f.get('acodec', 'none')
-            
-            resolution = 'N/A'
-            if vcodec != 'none':
-                height = f.get('height')
-                width = f.get('width')
-                if height:
-                    resolution = f"{height}p"
-                elif width and height:
-                    resolution = f"{width}x{height}"
-            
-            # 备注
-            note = ''
-            if vcodec != 'none' and acodec == 'none':
-                note = '纯视频'
-            elif vcodec == 'none' and acodec != 'none':
-                note = '纯音频'
-            elif vcodec != 'none' and acodec != 'none':
-                note = '视频+音频'
-            
-            filesize = f.get('filesize') or f.get('filesize_approx')
-            
-            tree.insert("", "end", values=(
-                f.get('format_id', ''),
-                f.get('ext', ''),
-                resolution,
-                f.get('fps', '') or '',
-                vcodec if vcodec != 'none' else '',
-                acodec if acodec != 'none' else '',
-                format_size(filesize),
-                note
-            ))
+        view = VirtualTreeview(main_frame, columns, self.format_list_model(format_table), height=15)
+        filter_var.trace_add('write', lambda *args: view.set_filter(filter_var.get()))
         
-        # 滚动条
-        scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        tree.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+        # 设置列宽
+        for col, width, anchor in (("ID", 80, tk.W), ("格式", 60, tk.CENTER), ("分辨率", 100, tk.W),
+                                   ("帧率", 60, tk.CENTER), ("视频编码", 120, tk.W), ("音频编码", 120, tk.W),
+                                   ("大小(MB)", 100, tk.E), ("备注", 120, tk.W)):
+            view.tree.column(col, width=width, anchor=anchor)
+        view.frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
         
         # 双击选择事件
         def on_double_click(event):
-            try:
-                item = tree.selection()[0]
-                format_id = tree.item(item, "values")[0]
+            row = view.selected_row()
+            if row is not None:
+                format_id = row[0]
                 self.format_id_var.set(format_id)
                 formats_window.destroy()
                 self.result_queue.put(('success', f"已选择格式: {format_id}"))
-            except IndexError:
-                pass
         
-        tree.bind("<Double-1>", on_double_click)
+        view.tree.bind("<Double-1>", on_double_click)
         
         # 推荐格式区域
         if recommended_format:
@@ -721,14 +1106,14 @@ class VideoMasterProOfficialApp:
         button_frame.pack(fill=tk.X)
         
         def use_selected():
-            try:
-                item = tree.selection()[0]
-                format_id = tree.item(item, "values")[0]
-                self.format_id_var.set(format_id)
-                formats_window.destroy()
-                self.result_queue.put(('success', f"已选择格式: {format_id}"))
-            except IndexError:
+            row = view.selected_row()
+            if row is None:
                 messagebox.showwarning("提示", "请先选择一个格式")
+                return
+            format_id = row[0]
+            self.format_id_var.set(format_id)
+            formats_window.destroy()
+            self.result_queue.put(('success', f"已选择格式: {format_id}"))
         
         select_btn = tk.Button(button_frame, text="使用选中格式", font=('SF Pro Display', 10, 'bold'),
                               bg=self.colors['primary'], fg='white', relief='flat', bd=0,
@@ -740,14 +1125,151 @@ class VideoMasterProOfficialApp:
                               padx=20, command=formats_window.destroy)
         cancel_btn.pack(side=tk.RIGHT)
     
+    def create_filter_entry(self, parent):
+        """在表格上方创建筛选输入框，返回其 StringVar"""
+        filter_frame = tk.Frame(parent, bg=self.colors['bg'])
+        filter_frame.pack(fill=tk.X, pady=(0, 10))
+        tk.Label(filter_frame, text="🔍 筛选:", font=('SF Pro Display', 10),
+                bg=self.colors['bg'], fg=self.colors['text']).pack(side=tk.LEFT)
+        filter_var = tk.StringVar()
+        tk.Entry(filter_frame, textvariable=filter_var, font=('SF Pro Display', 10)).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=(10, 0))
+        return filter_var
+    
+    def format_list_model(self, format_table):
+        """格式窗口的行数据（每个格式表只构建一次，重新打开窗口时复用）"""
+        cached = self.formats_list_cache
+        if cached is not None and cached[0] is format_table:
+            model = cached[1]
+            model.reset()
+            return model
+        
+        # 默认按分辨率、帧率降序；分辨率、帧率和大小列按数值排序
+        table = format_table
+        order = table.sorted_by_quality()
+        rows = []
+        for i in order:
+            vcodec = table.vcodec_name(i)
+            acodec = table.acodec_name(i)
+            height = table.height[i]
+            fps = table.fps[i]
+            filesize = table.filesize[i]
+            rows.append((
+                table.format_ids[i],
+                table.exts[i],
+                f"{height}p" if vcodec != 'none' and height else 'N/A',
+                f"{fps:g}" if fps else '',
+                '' if vcodec == 'none' else vcodec or '未知',
+                '' if acodec == 'none' else acodec or '未知',
+                f"{filesize / (1024*1024):.1f}" if filesize else "N/A",
+                table.kind(i)
+            ))
+        sort_keys = {2: [table.height[i] for i in order],
+                     3: [table.fps[i] for i in order],
+                     6: [table.filesize[i] for i in order]}
+        
+        model = VirtualListModel(rows, sort_keys)
+        self.formats_list_cache = (format_table, model)
+        return model
+    
     def reopen_formats_window(self, event=None):
         """重新打开格式选择窗口"""
         if hasattr(self, 'last_formats_data') and self.last_formats_data:
-            title, formats, recommended_format = self.last_formats_data
-            self.show_formats_window(title, formats, recommended_format)
+            title, format_table, recommended_format = self.last_formats_data
+            self.show_formats_window(title, format_table, recommended_format)
         else:
             self.result_queue.put(('info', "请先点击查询获取格式数据"))
     
+    def get_format_constraints(self):
+        """根据界面上的格式偏好构建格式约束"""
+        def limit(var):
+            value = var.get()
+            return int(value) if value.isdigit() else None
+        
+        video_codecs, audio_codecs, container = self.CODEC_PREFERENCES.get(self.codec_pref_var.get(), ((), (), None))
+        return FormatConstraints(max_height=limit(self.max_height_var), max_fps=limit(self.max_fps_var),
+                                 video_codecs=video_codecs, audio_codecs=audio_codecs, container=container)
+    
+    def get_storage_budget(self):
+        """存储预算（字节），未设置或无效时返回 None"""
+        try:
+            budget = float(self.budget_var.get().strip())
+        except ValueError:
+            return None
+        return int(budget * 1024 ** 3) if budget > 0 else None
+    
+    def plan_budget_formats(self, urls, budget):
+        """在预算内为每个已预解析的链接选择格式，返回 {url: (格式语句, 预计字节数, 分辨率)}
+        
+        每个视频按格式偏好列出各分辨率档位，再按画质得分做整批取舍：
+        时长越长的视频升级越"贵"，会先被降档。尚未解析或无法估算大小的链接不参与分配。
+        所有视频都取最低档位仍超出预算时，分配结果的总大小大于 budget。
+        各链接的档位和分配结果都会缓存，格式偏好或预解析结果变化时才重新计算。
+        """
+        key = (budget, tuple(urls))
+        if self.plan_assigned is not None and self.plan_assigned[0] == key:
+            return self.plan_assigned[1]
+        
+        constraints = None
+        candidates = []
+        for url in urls:
+            summary = self.prefetch_summaries.get(url)
+            if summary is None:
+                continue
+            options = self.plan_options.get(url)
+            if options is None:
+                if constraints is None:
+                    constraints = self.get_format_constraints()
+                options = self.plan_options[url] = sorted(
+                    format_options(summary['format_table'], constraints, summary.get('duration')),
+                    key=lambda option: option[1])
+            if options:
+                candidates.append((url, options))
+        
+        chosen, _ = fit_to_budget([[(size, quality_score(height)) for _, size, height in options]
+                                   for _, options in candidates], budget)
+        assigned = {url: options[step] for (url, options), step in zip(candidates, chosen) if step is not None}
+        self.plan_assigned = (key, assigned)
+        return assigned
+    
+    def estimate_download_size(self, format_table, duration=None):
+        """估算按当前格式设置下载的字节数，无法估算时返回 0"""
+        format_spec = self.format_id_var.get().strip() or self.DEFAULT_FORMAT
+        if format_spec == self.auto_format_spec and format_spec != self.DEFAULT_FORMAT:
+            # 按偏好生成的通用语句带过滤条件，无法直接解析，改用打分后的具体格式估算
+            format_spec = select_format(format_table, self.get_format_constraints(), duration)
+        return format_table.estimate_size(format_spec, duration)
+    
+    def on_format_id_changed(self, *args):
+        """格式ID变更：各链接的预计大小需要重新估算（分辨率档位不受影响）"""
+        self.invalidate_batch_plan(options=False)
+        self.schedule_batch_plan()
+    
+    def on_format_prefs_changed(self, *args):
+        """格式偏好变更：格式ID未被手动修改时，改用按偏好生成的通用选择语句"""
+        self.invalidate_batch_plan()
+        self.schedule_batch_plan()
+        if self.format_id_var.get() != self.auto_format_spec:
+            return
+        
+        constraints = self.get_format_constraints()
+        self.auto_format_spec = self.DEFAULT_FORMAT if constraints.is_default() else constraints.selector()
+        self.format_id_var.set(self.auto_format_spec)
+    
+    def on_workers_changed(self, *args):
+        """并行任务数变更"""
+        try:
+            value = int(self.workers_var.get())
+        except (ValueError, tk.TclError):
+            return
+        
+        if value < 1:
+            return
+        
+        with self.worker_slots:
+            self.max_workers = value
+            self.worker_slots.notify_all()
+    
     def browse_path(self):
         """浏览保存路径"""
         path = filedialog.askdirectory()
@@ -756,62 +1278,448 @@ class VideoMasterProOfficialApp:
     
     def start_download(self):
         """开始下载"""
-        urls = []
-        
-        # 获取单个URL
-        single_url = self.url_entry.get().strip()
-        if single_url and self.validate_url(single_url):
-            urls.append(single_url)
-        
-        # 获取批量URL
-        batch_urls = self.urls_text.get(1.0, tk.END).strip().split('\n')
-        for url in batch_urls:
-            url = url.strip()
-            if url and self.validate_url(url) and url not in urls:
-                urls.append(url)
+        # 单个URL + 批量URL，按视频ID去重
+        urls = self.unique_urls([self.url_entry.get()] + self.urls_text.get(1.0, tk.END).split('\n'))
         
         if not urls:
             messagebox.showerror("错误", "请输入有效的YouTube链接")
             return
         
         # 准备下载参数
-        proxy = self.proxy_entry.get().strip() or None if self.use_proxy.get() else None
+        proxy = self.get_proxy()
         save_path = self.save_path_var.get()
-        format_id = self.format_id_var.get().strip() or "bv*+ba/b"
+        format_id = self.format_id_var.get().strip() or self.DEFAULT_FORMAT
         download_subtitles = self.subtitle_var.get()
-        thread_count = int(self.threads_var.get())
+        threads = self.threads_var.get().strip()
+        try:
+            thread_count = 'auto' if threads == '自动' else max(1, int(threads))
+        except ValueError:
+            messagebox.showerror("错误", "线程数必须是正整数或“自动”")
+            return
         transcode = self.transcode_var.get()
         transcode_format = self.transcode_format.get()
         
+        options = {
+            'proxy': proxy,
+            'save_path': save_path,
+            'format_id': format_id,
+            'download_subtitles': download_subtitles,
+            'thread_count': thread_count,
+            'transcode': transcode,
+            'transcode_format': transcode_format
+        }
+        # 播放列表/频道模式下，列表链接在后台逐页展开
+        playlists = []
+        sync = self.sync_mode_var.get()
+        if self.playlist_mode_var.get() or sync:
+            playlists = [url for url in urls if self.is_playlist_url(url)]
+            urls = [url for url in urls if url not in playlists]
+        
+        # 存储预算模式：每个视频使用分配到的格式（通用选择语句兜底）
+        budget = self.get_storage_budget()
+        assigned = self.plan_budget_formats(urls, budget) if budget else {}
+        if budget:
+            total = sum(size for _, size, _ in assigned.values())
+            if total > budget and not messagebox.askyesno(
+                    "超出存储预算",
+                    f"即使所有视频都使用最低分辨率，预计仍需 {format_bytes(total)}，"
+                    f"超出存储预算 {format_bytes(budget)}。\n\n仍然开始下载吗？"):
+                return
+            self.result_queue.put(('info', f"💾 存储预算 {format_bytes(budget)}: 已为 {len(assigned)}/{len(urls)} 个视频分配格式, 共约 {format_bytes(total)}"))
+            if total > budget:
+                self.result_queue.put(('warning', f"超出存储预算 {format_bytes(total - budget)}，所有视频已使用最低分辨率"))
+            if len(assigned) < len(urls):
+                self.result_queue.put(('warning', f"{len(urls) - len(assigned)} 个视频尚未解析完成或大小未知，使用格式ID中的设置"))
+        
+        def options_for(url):
+            if url not in assigned:
+                return options
+            spec, size, height = assigned[url]
+            return dict(options, format_id=f"{spec}/{self.get_format_constraints().selector()}")
+        
+        if urls:
+            # 已下载过和重复的视频由 enqueue_tasks 单独报告，这里只统计实际加入队列的任务
+            tasks = self.enqueue_tasks([(url, options_for(url)) for url in urls])
+            if tasks:
+                self.result_queue.put(('info', f"开始下载 {len(tasks)} 个视频 (并行任务: {self.max_workers})"))
+            else:
+                self.result_queue.put(('info', "没有需要下载的新视频"))
+        
+        for url in playlists:
+            token = CancellationToken()
+            with self.task_lock:
+                self._reset_batch_if_idle()
+                self.expansions.add(token)
+            threading.Thread(target=self._expand_playlist, args=(url, options, token, sync), daemon=True).start()
+    
+    def enqueue_tasks(self, jobs, job_ids=None, skipped=None, sync_source=None):
+        """创建任务并加入下载队列，jobs 为 [(url, options), ...]
+        
+        已在排队或下载中的视频（按规范化后的视频ID判断）会被跳过，
+        下载存档中已完成的视频不经过解析直接跳过。
+        skipped 为 {'archived': [], 'duplicates': []} 时跳过的链接追加到其中，由调用方汇总报告，不再逐次报告。
+        sync_source 为增量同步的来源，任务下载完成后才记入该来源的同步位置。
+        """
+        if job_ids is None:
+            job_ids = [None] * len(jobs)
+        
+        # 按视频ID去重：同一批中重复的链接，以及已在队列或下载中的视频
+        with self.task_lock:
+            keys = {}
+            fresh, duplicates, archived = [], [], []
+            for (url, options), job_id in zip(jobs, job_ids):
+                key = self.dedup_key(url)
+                if key in keys or key in self.task_index:
+                    duplicates.append((url, job_id))
+                    # 已在队列中的同一视频完成后同样记入同步位置
+                    existing = self.task_index.get(key)
+                    if sync_source and existing is not None and existing.sync_source is None:
+                        existing.sync_source = sync_source
+                elif self.is_archived(key):
+                    archived.append((url, job_id))
+                else:
+                    keys[key] = None
+                    fresh.append((key, url, options, job_id))
+        
+        if skipped is not None:
+            skipped['archived'].extend(url for url, _ in archived)
+            skipped['duplicates'].extend(url for url, _ in duplicates)
+        else:
+            self.report_skipped(len(archived), len(duplicates))
+        
+        # 恢复的任务记录中已下载过的视频和重复项直接结束
+        for _, job_id in archived:
+            if job_id and self.job_journal:
+                self.job_journal.update_state(job_id, 'done')
+        for _, job_id in duplicates:
+            if job_id and self.job_journal:
+                self.job_journal.update_state(job_id, 'cancelled', error='重复的视频')
+        
+        # 先写入任务日志，崩溃后可以恢复
+        new_jobs = [(url, options) for _, url, options, job_id in fresh if job_id is None]
+        if new_jobs and self.job_journal:
+            try:
+                new_ids = iter(self.job_journal.add_jobs(new_jobs))
+                fresh = [(key, url, options, job_id if job_id is not None else next(new_ids))
+                         for key, url, options, job_id in fresh]
+            except Exception as e:
+                self.logger.error(f"写入任务记录失败: {str(e)}")
+        
         # 设置任务
-        self.download_tasks = urls.copy()
-        self.current_task_index = 0
-        self.total_tasks = len(urls)
-        self.abort_all_tasks = False
+        with self.task_lock:
+            self._reset_batch_if_idle()
+            
+            tasks = []
+            for key, url, options, job_id in fresh:
+                # 两次加锁之间可能已有相同的视频入队
+                if key in self.task_index:
+                    continue
+                self.task_counter += 1
+                task = DownloadTask.from_options(
+                    f"task_{self.task_counter}", self.total_tasks + len(tasks) + 1, url, options)
+                task.job_id = job_id
+                task.dedup_key = key
+                task.sync_source = sync_source
+                task.on_change = self._on_task_change
+                self.task_index[key] = task
+                tasks.append(task)
+            self.download_tasks.update((task.task_id, task) for task in tasks)
+            self.total_tasks += len(tasks)
         
         # 添加到队列
-        for url in urls:
-            self.download_queue.put((
-                'download', url, proxy, save_path, format_id,
-                download_subtitles, thread_count, transcode, transcode_format
-            ))
+        for task in tasks:
+            self.download_queue.put(('download', task))
+        
+        return tasks
+    
+    def report_skipped(self, archived, duplicates):
+        """报告跳过的已下载过的视频和重复视频的数量"""
+        if archived:
+            self.result_queue.put(('info', f"⏭️ 跳过 {archived} 个已下载过的视频（下载存档）"))
+        if duplicates:
+            self.result_queue.put(('warning', f"跳过 {duplicates} 个重复的视频（已在队列或下载中）"))
+    
+    def unique_urls(self, lines):
+        """过滤无效链接并去重（保持输入顺序）：单个视频按规范化的视频ID，播放列表和频道按来源（含标签页）"""
+        unique = {}
+        for url, key in normalize_urls(lines):
+            unique.setdefault(source_key(url, key), url)
+        return list(unique.values())
+    
+    def is_archived(self, key):
+        """视频是否已在下载存档中（关闭“跳过已下载”时始终返回 False）"""
+        return (self.skip_archived and self.download_archive is not None
+                and key[0] == 'video' and self.download_archive.contains('youtube', key[1]))
+    
+    def dedup_key(self, url):
+        """去重使用的键：视频为 ('video', ID)，播放列表和频道为来源键（见 source_key），其他链接为原始链接"""
+        key = parse_youtube_url(url)
+        if key is None:
+            return url.strip()
+        # 视频任务只下载视频本身（播放列表参数被去掉），按视频ID去重
+        if key.kind == 'video':
+            return key[:2]
+        return source_key(url, key)
+    
+    def _reset_batch_if_idle(self):
+        """上一批已全部结束时重新计数（调用方持有 task_lock）"""
+        if self.active_tasks or not self.download_queue.empty() or self.expansions:
+            return
+        
+        self.download_tasks.clear()
+        self.total_tasks = 0
+        self.finished_tasks = 0
+        self.failed_tasks = 0
+        self.cancelled_tasks = 0
+        self.batch_reported = False
+        self.throughput_meter.reset_batch()
+    
+    def is_playlist_url(self, url):
+        """是否为播放列表或频道链接（包括带 list 参数的视频链接）"""
+        key = parse_youtube_url(url)
+        return key is not None and (key.kind != 'video' or key.list_id is not None)
+    
+    def _expand_playlist(self, url, options, token, sync=False):
+        """以扁平模式逐页展开播放列表/频道，边展开边加入下载队列
+        
+        增量同步时，频道按上传时间从新到旧翻页（上传列表 UU... 同样），遇到上次同步见过的视频即停止。
+        只有下载完成或已在下载存档中的视频才记入同步位置，失败或取消的视频下次同步时会重新加入。
+        """
+        count = 0
+        try:
+            # watch?v=...&list=... 形式的链接按整个播放列表处理
+            key = parse_youtube_url(url)
+            if key is not None and key.kind == 'video':
+                key = key._replace(kind='playlist', id=key.list_id, list_id=None)
+            # 播放列表使用标准链接；频道链接保持原样，保留用户选择的标签页（如 /shorts、/streams）
+            tab = None
+            if key is not None and key.kind == 'playlist':
+                url = canonical_url(key)
+            elif key is not None:
+                tab = channel_tab(url)
+            
+            # 只有从新到旧排列的来源才能在已知视频处停止
+            source = None
+            known_ids = set()
+            if sync and key is not None and (key.kind == 'channel' and tab in (None, 'videos', 'shorts', 'streams')
+                                             or key.kind == 'playlist' and key.id.startswith('UU')):
+                source = f"{key.kind}:{key.id}"
+                if key.kind == 'channel' and tab in (None, 'videos'):
+                    # 频道首页不按时间排序，改用上传视频标签页
+                    url = canonical_url(key) + '/videos'
+                elif key.kind == 'channel':
+                    # 短视频、直播标签页分别记录同步位置
+                    source += f"/{tab}"
+                known_ids = self.sync_state.known_ids(source)
+            elif sync:
+                self.result_queue.put(('warning', f"该链接不是按时间排序的频道，无法增量同步，将完整展开: {url}"))
+            
+            self.result_queue.put(('info', f"📋 开始{'同步' if source and known_ids else '展开'}播放列表: {url}"))
+            
+            ydl_opts = self.get_ydl_opts(options['proxy'])
+            ydl_opts.update({'extract_flat': 'in_playlist', 'lazy_playlist': True})
+            
+            reached_known = False
+            listed = 0
+            chunk = []
+            skipped = {'archived': [], 'duplicates': []}
+            try:
+                with self.ydl_pool.lease(ydl_opts) as ydl:
+                    for video_url in self._iter_playlist_entries(ydl, url):
+                        if source:
+                            video_id = video_id_of(video_url)
+                            if video_id in known_ids:
+                                # 后续都是上次同步过的内容，不再请求下一页
+                                reached_known = True
+                                break
+                        
+                        chunk.append((video_url, options))
+                        listed += 1
+                        if listed % 100 == 0:
+                            self.result_queue.put(('info', f"📋 已展开 {listed} 个视频..."))
+                        if len(chunk) >= self.PLAYLIST_ENQUEUE_CHUNK:
+                            if not self._wait_for_queue_space(token):
+                                break
+                            count += len(self.enqueue_tasks(chunk, skipped=skipped, sync_source=source))
+                            chunk = []
+            finally:
+                # 展开中途出错时，已列出的视频仍然加入队列；跳过的视频每次展开只汇总报告一次
+                if chunk and self._wait_for_queue_space(token):
+                    count += len(self.enqueue_tasks(chunk, skipped=skipped, sync_source=source))
+                self.report_skipped(len(skipped['archived']), len(skipped['duplicates']))
+                # 已在下载存档中的视频直接记入同步位置，其余的在各自下载完成时记入
+                if source:
+                    self.sync_state.record(source, [video_id_of(video_url) for video_url in skipped['archived']])
+            
+            if source and not token.cancelled:
+                detail = "已到达上次同步位置" if reached_known else "已获取全部视频"
+                self.result_queue.put(('success', f"🔄 增量同步完成: {count} 个新视频 ({detail})"))
+            else:
+                self.result_queue.put(('success', f"📋 播放列表展开完成: {count} 个视频"))
+        
+        except Exception as e:
+            self.result_queue.put(('error', f"播放列表展开失败 (已加入 {count} 个): {str(e)}"))
+        finally:
+            with self.task_lock:
+                self.expansions.discard(token)
+            self._report_if_batch_finished()
+    
+    def _iter_playlist_entries(self, ydl, url, depth=0):
+        """逐个产出播放列表中的视频链接；entries 是惰性生成器，翻页在迭代时才发生"""
+        result = ydl.extract_info(url, download=False, process=False)
+        
+        # 频道首页等链接会先重定向到实际的列表页
+        hops = 0
+        while result.get('_type') in ('url', 'url_transparent') and hops < 5:
+            result = ydl.extract_info(result['url'], download=False, process=False, ie_key=result.get('ie_key'))
+            hops += 1
+        
+        if result.get('_type') != 'playlist':
+            yield result.get('webpage_url') or url
+            return
+        
+        for entry in result.get('entries') or []:
+            if not entry:
+                continue
+            
+            entry_url = entry.get('url') or entry.get('webpage_url')
+            if entry.get('ie_key') == 'Youtube' and entry.get('id'):
+                yield f"https://www.youtube.com/watch?v={entry['id']}"
+            elif entry.get('ie_key') == 'YoutubeTab' and entry_url and depth < 2:
+                # 频道包含多个标签页（视频、Shorts、直播等）
+                yield from self._iter_playlist_entries(ydl, entry_url, depth + 1)
+            elif entry_url:
+                yield entry_url
+    
+    def _wait_for_queue_space(self, token):
+        """队列中排队的任务过多时阻塞，直到分派线程取走任务；被取消时返回 False"""
+        with self.queue_space:
+            while self.download_queue.qsize() >= self.PLAYLIST_QUEUE_AHEAD and not token.cancelled:
+                self.queue_space.wait()
+        return not token.cancelled
+    
+    def open_download_archive(self):
+        """打开下载存档，首次使用时从下载历史中导入已完成的视频"""
+        try:
+            archive = DownloadArchive(os.path.join(get_data_dir(), 'download_archive.txt'))
+            if not archive.existed and self.history_store is not None:
+                archive.add_many(('youtube', video_id) for video_id in self.history_store.video_ids())
+            return archive
+        except Exception as e:
+            self.logger.error(f"打开下载存档失败: {str(e)}")
+            return None
+    
+    def open_job_journal(self):
+        """打开任务日志数据库"""
+        try:
+            journal = JobJournal(os.path.join(get_data_dir(), 'jobs.db'))
+            journal.purge_finished()
+            return journal
+        except Exception as e:
+            self.logger.error(f"打开任务记录失败: {str(e)}")
+            return None
+    
+    def resume_pending_jobs(self):
+        """重新加入上次未完成的任务，yt-dlp 会从 .part 文件续传"""
+        if not self.job_journal:
+            return
+        
+        try:
+            pending = self.job_journal.pending_jobs()
+        except Exception as e:
+            self.logger.error(f"读取任务记录失败: {str(e)}")
+            return
+        
+        if not pending:
+            return
+        
+        for job_id, url, options, state in pending:
+            if state != 'queued':
+                self.job_journal.update_state(job_id, 'queued')
         
-        self.result_queue.put(('info', f"开始下载 {len(urls)} 个视频"))
+        self.enqueue_tasks([(url, options) for _, url, options, _ in pending],
+                           job_ids=[job_id for job_id, _, _, _ in pending])
+        self.result_queue.put(('warning', f"♻️ 恢复上次未完成的任务: {len(pending)} 个"))
+    
+    def _on_task_change(self, task):
+        """任务状态变化时写入任务日志，任务结束后从任务表和去重索引中移除"""
+        if task.status in FINISHED_STATES:
+            with self.task_lock:
+                self.download_tasks.pop(task.task_id, None)
+                if self.task_index.get(task.dedup_key) is task:
+                    del self.task_index[task.dedup_key]
+        
+        if not task.job_id or not self.job_journal:
+            return
+        try:
+            self.job_journal.update_state(task.job_id, task.status, title=task.title, error=task.error)
+        except Exception as e:
+            self.logger.error(f"更新任务记录失败: {str(e)}")
     
     def stop_download(self):
-        """停止下载"""
-        self.abort_all_tasks = True
-        self.result_queue.put(('warning', "正在停止所有下载任务..."))
+        """停止下载：取消所有排队中和进行中的任务"""
+        with self.task_lock:
+            pending = list(self.download_tasks.values())
+        
+        # 进行中的任务会在下一次进度回调或解析结束时中断，ffmpeg 等子进程直接结束
+        for task in pending:
+            task.cancel_token.cancel()
+        
+        # 停止展开播放列表
+        with self.task_lock:
+            expansions = list(self.expansions)
+        for token in expansions:
+            token.cancel()
+        
+        # 丢弃尚未分派的任务，并唤醒等待槽位的分派线程
+        dropped = 0
+        while True:
+            try:
+                self.download_queue.get_nowait()[1].mark('cancelled')
+                dropped += 1
+            except queue.Empty:
+                break
+        with self.worker_slots:
+            self.cancelled_tasks += dropped
+            self.worker_slots.notify_all()
+            self.queue_space.notify_all()
+        
+        self.result_queue.put(('warning', f"正在停止所有下载任务... ({len(pending)} 个)"))
+        # 只有排队中的任务时不会再有任务结束，在这里输出本批统计
+        self._report_if_batch_finished()
     
     def clear_logs(self):
         """清空日志"""
         self.log_text.config(state=tk.NORMAL)
         self.log_text.delete(1.0, tk.END)
         self.log_text.config(state=tk.DISABLED)
+        self.log_lines = 0
+    
+    def open_full_log(self):
+        """用系统默认程序打开完整的日志文件（日志窗口只保留最近的部分）"""
+        if not os.path.exists(self.log_file_path):
+            messagebox.showinfo("提示", "暂无日志文件")
+            return
+        
+        try:
+            if platform.system() == 'Windows':
+                os.startfile(self.log_file_path)
+            elif platform.system() == 'Darwin':
+                subprocess.Popen(['open', self.log_file_path])
+            else:
+                subprocess.Popen(['xdg-open', self.log_file_path])
+        except Exception as e:
+            messagebox.showerror("错误", f"无法打开日志文件: {str(e)}\n{self.log_file_path}")
     
     def show_history(self):
         """显示下载历史"""
-        if not hasattr(self, 'download_history') or not self.download_history:
+        rows = []
+        if self.history_store is not None:
+            # 先写完刚完成的下载（写入线程已停止或太慢时不再等待）
+            if not self.history_store.flush(self.HISTORY_FLUSH_TIMEOUT):
+                self.logger.warning("部分下载历史尚未写入，列表可能不完整")
+            rows = [row + ('完成',) for row in self.history_store.rows(('timestamp', 'title', 'format_id'))]
+        if not rows:
             messagebox.showinfo("下载历史", "暂无下载记录")
             return
         
@@ -821,141 +1729,323 @@ class VideoMasterProOfficialApp:
         history_window.geometry("900x500")
         history_window.configure(bg=self.colors['bg'])
         
-        # 创建表格
+        main_frame = tk.Frame(history_window, bg=self.colors['bg'])
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        filter_var = self.create_filter_entry(main_frame)
+        
+        # 全部历史记录（最新的在前），只创建可见的行
         columns = ("时间", "标题", "格式", "状态")
-        tree = ttk.Treeview(history_window, columns=columns, show="headings", height=15)
+        view = VirtualTreeview(main_frame, columns, VirtualListModel(rows), height=15)
+        filter_var.trace_add('write', lambda *args: view.set_filter(filter_var.get()))
         
         for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=200)
-        
-        # 添加数据
-        for entry in reversed(self.download_history[-50:]):  # 最近50条
-            tree.insert("", "end", values=(
-                entry.get('timestamp', ''),
-                entry.get('title', '')[:50],
-                entry.get('format_id', ''),
-                '完成'
-            ))
-        
-        # 滚动条
-        scrollbar_h = ttk.Scrollbar(history_window, orient="vertical", command=tree.yview)
-        tree.configure(yscroll=scrollbar_h.set)
-        
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=20, pady=20)
-        scrollbar_h.pack(side=tk.RIGHT, fill=tk.Y, pady=20)
+            view.tree.column(col, width=200)
+        view.frame.pack(fill=tk.BOTH, expand=True)
     
-    def load_download_history(self):
-        """加载下载历史"""
+    def open_history_store(self):
+        """打开下载历史数据库，首次使用时导入旧版的 download_history.json"""
         try:
-            if os.path.exists('download_history.json'):
-                with open('download_history.json', 'r', encoding='utf-8') as f:
-                    self.download_history = json.load(f)
-            else:
-                self.download_history = []
+            store = HistoryStore(os.path.join(get_data_dir(), 'history.db'), on_error=self.report_history_error)
+            atexit.register(store.close)
+            if store.count() == 0 and os.path.exists('download_history.json'):
+                imported = store.import_json('download_history.json', video_id_of)
+                self.logger.info(f"已导入 {imported} 条下载历史")
+            return store
         except Exception as e:
-            self.logger.error(f"加载历史失败: {str(e)}")
-            self.download_history = []
+            self.report_history_error(f"打开下载历史失败，本次下载不会记录到历史: {str(e)}")
+            return None
+    
+    def report_history_error(self, message):
+        """下载历史写入失败：写入日志，并在界面上提示一次（可在任意线程调用）"""
+        self.logger.error(message)
+        with self.history_lock:
+            if self.history_error_shown:
+                return
+            self.history_error_shown = True
+        self.result_queue.call(messagebox.showwarning, "下载历史", f"{message}\n\n之后的错误只记录在日志中。")
     
     def save_download_history(self, url, title, format_id, save_path):
-        """保存下载历史"""
-        try:
-            entry = {
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'url': url,
-                'title': title,
-                'format_id': format_id,
-                'save_path': save_path
-            }
-            
-            self.download_history.append(entry)
-            
-            # 只保留最近1000条记录
-            if len(self.download_history) > 1000:
-                self.download_history = self.download_history[-1000:]
-            
-            with open('download_history.json', 'w', encoding='utf-8') as f:
-                json.dump(self.download_history, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            self.logger.error(f"保存历史失败: {str(e)}")
+        """保存下载历史（追加一条记录，由后台线程写入）"""
+        if self.history_store is None:
+            return
+        self.history_store.add({
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'video_id': video_id_of(url),
+            'url': url,
+            'title': title,
+            'format_id': format_id,
+            'save_path': save_path
+        })
     
     def process_queue(self):
-        """处理下载队列"""
+        """处理下载队列，按并行任务数分派给工作线程"""
         while True:
             try:
-                if self.abort_all_tasks:
-                    # 清空队列
-                    while not self.download_queue.empty():
-                        try:
-                            self.download_queue.get_nowait()
-                        except:
-                            break
+                # 阻塞等待，空闲时不占用CPU
+                task = self.download_queue.get()
+                if task[0] != 'download':
                     continue
                 
-                task = self.download_queue.get(timeout=1)
-                if task[0] == 'download':
-                    self.current_task_index += 1
-                    self._download(*task[1:])
+                task = task[1]
+                
+                # 等待空闲的工作槽位（任务结束、并行数变更或停止下载时唤醒）
+                with self.worker_slots:
+                    # 队列有了空位，唤醒正在展开播放列表的线程
+                    self.queue_space.notify_all()
+                    while len(self.active_tasks) >= self.max_workers and not task.cancel_token.cancelled:
+                        self.worker_slots.wait()
+                    
+                    cancelled = task.cancel_token.cancelled
+                    if cancelled:
+                        self.cancelled_tasks += 1
+                    else:
+                        self.active_tasks[task.task_id] = task
+                
+                # 状态回调会获取 task_lock，在锁外更新
+                if cancelled:
+                    task.mark('cancelled')
+                    self._report_if_batch_finished()
+                    continue
+                
+                thread = threading.Thread(target=self._run_task, args=(task,), daemon=True)
+                self.download_threads[task.task_id] = thread
+                thread.start()
+                self.result_queue.call(self.start_progress_sampling)
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 self.result_queue.put(('error', f"处理队列错误: {str(e)}"))
     
-    def _download(self, url, proxy, save_path, format_id, download_subtitles, thread_count, transcode, transcode_format):
+    def _run_task(self, task):
+        """在工作线程中执行单个任务，并在结束后释放槽位"""
+        try:
+            self._download(task)
+        finally:
+            with self.worker_slots:
+                self.active_tasks.pop(task.task_id, None)
+                self.download_threads.pop(task.task_id, None)
+                if task.status == 'done':
+                    self.finished_tasks += 1
+                elif task.status == 'failed':
+                    self.failed_tasks += 1
+                else:
+                    self.cancelled_tasks += 1
+                self.worker_slots.notify()
+            
+            self._report_if_batch_finished()
+    
+    def _report_if_batch_finished(self):
+        """没有进行中、排队中的任务，也没有正在展开的播放列表时，输出本批统计"""
+        with self.task_lock:
+            if (self.batch_reported or self.active_tasks or not self.download_queue.empty()
+                    or self.expansions or not self.total_tasks):
+                return
+            self.batch_reported = True
+            summary = f"全部任务结束: 成功 {self.finished_tasks}, 失败 {self.failed_tasks}"
+            if self.cancelled_tasks:
+                summary += f", 取消 {self.cancelled_tasks}"
+            summary += f", 共 {self.total_tasks}"
+        
+        self.result_queue.put(('success', summary))
+    
+    def _download(self, task):
         """执行下载"""
+        # 取消时结束本线程启动的 ffmpeg 等子进程（合并期间不会调用进度回调）
+        task.cancel_token.on_cancel(partial(kill_processes, collect_child_processes()))
         try:
-            self.is_downloading = True
+            task.cancel_token.raise_if_cancelled()
+            task.mark('extracting')
             
             # 提取干净的URL
-            clean_url = self.extract_clean_url(url)
+            clean_url = self.extract_clean_url(task.url)
             
-            ydl_opts = self.get_ydl_opts(proxy)
+            ydl_opts = self.get_ydl_opts(task.proxy)
             ydl_opts.update({
-                'format': format_id,
-                'outtmpl': f"{save_path}/%(title)s.%(ext)s",
-                'writesubtitles': download_subtitles,
-                'writeautomaticsub': download_subtitles,
-                'progress_hooks': [self._progress_hook]
+                'format': task.format_id,
+                'outtmpl': f"{task.save_path}/%(title)s.%(ext)s",
+                'writesubtitles': task.download_subtitles,
+                'writeautomaticsub': task.download_subtitles,
+                'progress_hooks': [partial(self._progress_hook, task)],
+                'postprocessor_hooks': [partial(self._postprocessor_hook, task)]
             })
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(clean_url, download=True)
+            # 分片并发（DASH/HLS）
+            fragment_session = None
+            if task.thread_count == 'auto':
+                fragment_session = FragmentSession(
+                    self.fragment_tuner,
+                    lambda level, msg: self.result_queue.put((level, f"{task.label} {msg}")))
+                ydl_opts['logger'] = fragment_session
+                ydl_opts['progress_hooks'].append(fragment_session.on_progress)
+            else:
+                ydl_opts['concurrent_fragment_downloads'] = task.thread_count
+            
+            with self.ydl_pool.lease(ydl_opts) as ydl:
+                if fragment_session:
+                    fragment_session.bind(ydl.params)
+                    self.result_queue.put(('info', f"{task.label} 自适应分片并发: {fragment_session.level}"))
+                
+                # 先解析信息（优先复用缓存），确定实际格式后再下载
+                task.cancel_token.raise_if_cancelled()
+                info = self.get_video_info(clean_url, ydl=ydl)
+                task.cancel_token.raise_if_cancelled()
+                
+                title = info.get('title', 'Unknown')
+                task.title = title
                 
-                if not self.abort_all_tasks:
-                    title = info.get('title', 'Unknown')
-                    self.result_queue.put(('success', f"下载完成: {title}"))
-                    self.save_download_history(clean_url, title, format_id, save_path)
+                # 下载前记录实际选中的格式；process_ie_result 会修改传入的字典，缓存中的信息需要复制
+                ydl.add_post_processor(ResolvedFormatRecorder(partial(self._record_resolved_format, task)), when='before_dl')
+                task.mark('downloading')
+                info = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                task.cancel_token.raise_if_cancelled()
+                
+                task.mark('done')
+                self.result_queue.put(('success', f"{task.label} 下载完成: {title}"))
+                if self.download_archive is not None:
+                    self.download_archive.add(info.get('extractor_key') or 'youtube', info.get('id'))
+                if task.sync_source:
+                    try:
+                        self.sync_state.record(task.sync_source, [info.get('id')])
+                    except OSError as e:
+                        self.logger.error(f"更新同步位置失败: {str(e)}")
+                self.save_download_history(clean_url, title, task.format_id, task.save_path)
+        
+        except DownloadCancelled:
+            task.mark('cancelled')
+            self.result_queue.put(('warning', f"{task.label} 已取消"))
+        except Exception as e:
+            # 子进程被结束后 yt-dlp 报告的合并失败
+            if task.cancel_token.cancelled:
+                task.mark('cancelled')
+                self.result_queue.put(('warning', f"{task.label} 已取消"))
+                return
+            task.mark('failed', str(e))
+            self.result_queue.put(('error', f"{task.label} 下载失败: {str(e)}"))
+    
+    def _record_resolved_format(self, task, info):
+        """把解析得到的格式ID写入任务日志，恢复时选择同样的格式，续传已有的 .part 文件"""
+        resolved = info.get('format_id')
+        if not task.job_id or not resolved or resolved == task.format_id:
+            return
         
+        try:
+            options = task.options()
+            options['format_id'] = resolved
+            self.job_journal.update_options(task.job_id, options)
         except Exception as e:
-            self.result_queue.put(('error', f"下载失败: {str(e)}"))
-        finally:
-            self.is_downloading = False
+            self.logger.error(f"更新任务记录失败: {str(e)}")
     
-    def _progress_hook(self, d):
+    def _progress_hook(self, task, d):
         """下载进度回调"""
-        if self.abort_all_tasks:
-            return
+        # 抛出异常会立即中断 yt-dlp 当前的传输
+        task.cancel_token.raise_if_cancelled()
         
         if d['status'] == 'downloading':
-            try:
-                percent = d.get('_percent_str', 'N/A')
-                speed = d.get('_speed_str', 'N/A')
-                self.result_queue.put(('info', f"下载进度: {percent} - 速度: {speed}"))
-            except:
-                pass
+            task.mark('downloading')
+            self.throughput_meter.update((task.task_id, d.get('filename')), d.get('downloaded_bytes'))
+            
+            # 进度原地更新，由界面定时采样；日志只记录里程碑
+            milestone = task.update_progress(d)
+            if milestone is not None:
+                self.result_queue.put(('info', f"{task.label} 下载进度: {milestone}%"))
         elif d['status'] == 'finished':
+            task.mark('merging')
+            self.throughput_meter.finish((task.task_id, d.get('filename')))
             filename = os.path.basename(d['filename'])
-            self.result_queue.put(('success', f"文件下载完成: {filename}"))
+            self.result_queue.put(('success', f"{task.label} 文件下载完成: {filename}"))
+    
+    def start_progress_sampling(self):
+        """有任务开始时启动进度采样（在界面线程中调用）"""
+        if self.progress_after_id is None:
+            self.sample_progress()
+    
+    def sample_progress(self):
+        """按固定帧率汇总进行中任务的进度并刷新界面，没有进行中的任务时停止采样（在界面线程中调用）"""
+        self.progress_after_id = None
+        with self.task_lock:
+            tasks = list(self.active_tasks.values())
+        
+        if tasks:
+            downloaded = sum(t.downloaded_bytes for t in tasks)
+            total = sum(t.total_bytes for t in tasks)
+            speed = sum(t.speed or 0 for t in tasks)
+            text = f"⬇️ 进行中 {len(tasks)} 个任务 · {format_bytes(downloaded)}"
+            if total:
+                text += f" / {format_bytes(total)} ({downloaded * 100 / total:.1f}%)"
+            text += f" · {format_bytes(speed)}/s"
+            etas = [t.eta for t in tasks if t.eta is not None]
+            if etas:
+                text += f" · 剩余 {format_duration(max(etas))}"
+        else:
+            text = "⬇️ 当前没有进行中的下载"
+        
+        if text != self.progress_var.get():
+            self.progress_var.set(text)
+        self._sync_progress_rows(tasks)
+        
+        # 下载过程中每秒按最新速度更新批量预估，全部结束后恢复为批量链接的预估
+        if not tasks or time.time() - self.plan_refreshed_at >= 1:
+            self.refresh_batch_plan()
+        
+        if tasks:
+            self.progress_after_id = self.root.after(1000 // self.PROGRESS_FPS, self.sample_progress)
+    
+    def _progress_row_values(self, task):
+        """任务在进度表中的一行（由任务的数值状态格式化）"""
+        title = task.title or (os.path.basename(task.filename) if task.filename else task.url)
+        percent = task.percent
+        downloaded = format_bytes(task.downloaded_bytes) if task.downloaded_bytes else ""
+        if task.total_bytes:
+            downloaded += f" / {format_bytes(task.total_bytes)}"
+        return (f"#{task.index}", title,
+                f"{percent:.1f}%" if percent is not None else "",
+                downloaded,
+                f"{format_bytes(task.speed)}/s" if task.speed else "",
+                format_duration(task.eta) if task.eta is not None else "",
+                self.STATUS_LABELS.get(task.status, task.status))
+    
+    def _sync_progress_rows(self, tasks):
+        """把进行中任务的状态同步到进度表，只更新内容发生变化的单元格，已结束的任务移除"""
+        rows = self.progress_rows
+        current = set()
+        for task in tasks:
+            values = self._progress_row_values(task)
+            current.add(task.task_id)
+            previous = rows.get(task.task_id)
+            if previous is None:
+                self.progress_tree.insert("", "end", iid=task.task_id, values=values)
+            elif values != previous:
+                for col, value, old in zip(self.PROGRESS_COLUMNS, values, previous):
+                    if value != old:
+                        self.progress_tree.set(task.task_id, col, value)
+            rows[task.task_id] = values
+        
+        for task_id in [task_id for task_id in rows if task_id not in current]:
+            del rows[task_id]
+            if self.progress_tree.exists(task_id):
+                self.progress_tree.delete(task_id)
+    
+    def _postprocessor_hook(self, task, d):
+        """后处理回调，取消时跳过后续的合并/转换步骤"""
+        task.cancel_token.raise_if_cancelled()
     
     def process_results(self):
-        """处理结果队列"""
+        """处理结果队列
+        
+        由结果队列的唤醒事件触发，空闲时不运行。每次最多处理 RESULTS_BUDGET_MS 毫秒或
+        RESULTS_MAX_MESSAGES 条消息，剩余的在让出事件循环后继续处理，避免突发的大量消息长时间阻塞界面。
+        这是工作线程更新界面的唯一入口：('call', 函数, 参数) 事件在这里执行。
+        """
+        if self.results_after_id is not None:
+            self.root.after_cancel(self.results_after_id)
+            self.results_after_id = None
+        
+        started = time.perf_counter()
+        depth = self.result_queue.pending()
+        processed = 0
         try:
-            while not self.result_queue.empty():
+            for result in self.result_queue.drain(self.RESULTS_BUDGET_MS, self.RESULTS_MAX_MESSAGES):
+                processed += 1
                 try:
-                    result = self.result_queue.get_nowait()
-                    
                     if len(result) >= 2:
                         msg_type = result[0]
                         message = result[1]
@@ -964,28 +2054,73 @@ class VideoMasterProOfficialApp:
                             level = result[1]
                             message = result[2]
                             self._append_log(f"[{level}] {message}", level.upper())
+                        elif msg_type == 'prefetch':
+                            self._update_prefetch_row(*result[1:])
+                        elif msg_type == 'call':
+                            result[1](*result[2])
                         else:
                             self._append_log(message, msg_type.upper())
                 
-                except queue.Empty:
-                    break
                 except Exception as e:
                     self._append_log(f"处理结果错误: {str(e)}", "ERROR")
         
         except Exception as e:
             print(f"Process results error: {e}")
         
-        # 继续处理
-        self.root.after(100, self.process_results)
+        backlog = self.result_queue.pending() > 0
+        self._record_results_tick(depth, processed, (time.perf_counter() - started) * 1000, backlog)
+        
+        # 有积压时先让出事件循环处理界面事件，再继续处理
+        if backlog:
+            self.results_after_id = self.root.after(self.RESULTS_BACKLOG_INTERVAL_MS, self.process_results)
+    
+    def _record_results_tick(self, depth, processed, elapsed_ms, backlog):
+        """记录结果队列的处理统计，出现积压时每分钟在日志中汇报一次"""
+        stats = self.results_stats
+        stats['ticks'] += 1
+        stats['messages'] += processed
+        stats['max_depth'] = max(stats['max_depth'], depth)
+        stats['max_tick_ms'] = max(stats['max_tick_ms'], elapsed_ms)
+        stats['avg_tick_ms'] += (elapsed_ms - stats['avg_tick_ms']) * 0.05
+        if backlog:
+            stats['backlog_ticks'] += 1
+        
+        now = time.time()
+        if now - self.results_reported_at >= 60:
+            if stats['backlog_ticks']:
+                self._append_log(f"⏱️ 结果队列积压: 最大深度 {stats['max_depth']}, 单次最长 {stats['max_tick_ms']:.1f} ms, "
+                                 f"平均 {stats['avg_tick_ms']:.2f} ms, 积压 {stats['backlog_ticks']}/{stats['ticks']} 次", "WARNING")
+            self.results_reported_at = now
+            stats.update(ticks=0, max_depth=0, max_tick_ms=0.0, backlog_ticks=0)
     
     def _append_log(self, message, tag="INFO"):
-        """添加日志"""
+        """添加日志（日志窗口只保留最近 LOG_MAX_LINES 行，完整内容写入日志文件）
+        
+        在工作线程中调用时转发到结果队列，由界面线程写入日志窗口。
+        """
+        if not in_main_thread():
+            self.result_queue.put((tag.lower(), message))
+            return
+        
+        self.file_logger.info(message, extra={'tag': tag})
         try:
+            # 用户向上翻看时不自动滚动到底部
+            at_bottom = self.log_text.yview()[1] >= 0.999
+            
             self.log_text.config(state=tk.NORMAL)
             timestamp = datetime.now().strftime("%H:%M:%S")
             self.log_text.insert(tk.END, f"[{timestamp}] {message}\n", tag)
+            self.log_lines += message.count('\n') + 1
+            
+            # 超出上限时成批删除最早的行，避免每次插入都裁剪
+            if self.log_lines > self.LOG_MAX_LINES + self.LOG_TRIM_LINES:
+                excess = self.log_lines - self.LOG_MAX_LINES
+                self.log_text.delete(1.0, f"{excess + 1}.0")
+                self.log_lines -= excess
+            
             self.log_text.config(state=tk.DISABLED)
-            self.log_text.see(tk.END)
+            if at_bottom:
+                self.log_text.see(tk.END)
         except:
             pass
 
@@ -10,6 +10,13 @@ from datetime import datetime
 import json
 import subprocess
 import platform
+from collections import deque
+
+from batch_planner import format_bytes, format_duration
+from download_tasks import (CancellationToken, process_group_kwargs, terminate_process_tree,
+                            PROGRESS_TEMPLATE, parse_progress_line)
+from ui_dispatch import UIEventQueue, in_main_thread
+from virtual_list import VirtualListModel, VirtualTreeview
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -53,7 +60,8 @@ class VideoMasterProApp:
 
         # 初始化变量
         self.download_queue = queue.Queue()
-        self.result_queue = queue.Queue()
+        # 工作线程只向结果队列发布事件，控件统一在 process_results 中更新
+        self.result_queue = UIEventQueue()
         self.download_tasks = []
         self.current_task_index = 0
         self.total_tasks = 0
@@ -61,6 +69,7 @@ class VideoMasterProApp:
         self.video_info = {}
         self.is_downloading = False
         self.download_threads = {}
+        self.cancel_tokens = {}
 
         self.setup_logging()
         self.create_widgets()
@@ -69,7 +78,10 @@ class VideoMasterProApp:
         self.processing_thread = threading.Thread(target=self.process_queue, daemon=True)
         self.processing_thread.start()
 
-        self.root.after(100, self.process_results)
+        # 有新事件时由工作线程唤醒结果处理，不再定时轮询
+        self.results_after_id = None
+        self.result_queue.bind_tk(self.root, self.process_results)
+        self.process_results()
 
     def setup_logging(self):
         self.logger = logging.getLogger(__name__)
@@ -577,50 +589,58 @@ class VideoMasterProApp:
         self.abort_all_tasks = False
         self.update_progress(0, "准备下载...")
 
-        # 创建下载队列
-        self.download_queue = queue.Queue()
+        # 加入下载队列（处理线程阻塞在同一个队列上，不能替换）
         for url in urls:
             self.logger.info(f"添加下载任务: {url} (格式: {format_id})")
             self.download_queue.put(("download", url, proxy, save_path, format_id, download_subtitles, thread_count, transcode, transcode_format))
 
     def stop_download(self):
         """终止正在进行的下载"""
-        if not self.is_downloading:
+        if not self.cancel_tokens and self.download_queue.empty():
             messagebox.showinfo("提示", "当前没有正在进行的下载")
             return
 
         self.abort_all_tasks = True
         self.logger.info("正在终止所有下载任务...")
 
-        # 等待所有线程结束
-        for task_id, thread in list(self.download_threads.items()):
-            if thread.is_alive():
-                self.logger.info(f"等待任务 {task_id} 终止...")
-                thread.join(timeout=1.0)
+        # 丢弃排队中的任务
+        while True:
+            try:
+                self.download_queue.get_nowait()
+                self.download_queue.task_done()
+            except queue.Empty:
+                break
+
+        # 取消令牌会立即结束 yt-dlp 子进程（及其派生的 ffmpeg 进程），无需等待线程
+        for token in list(self.cancel_tokens.values()):
+            token.cancel()
 
         self.is_downloading = False
-        self.download_threads = {}
         self.update_progress(0, "所有下载已终止")
         self.logger.info("所有下载任务已终止")
 
     def update_progress(self, percent, message):
-        """更新进度条和进度信息"""
+        """更新进度条和进度信息
+
+        在下载线程中调用时只记录最新进度，由界面线程在下一次处理结果队列时更新进度条。
+        """
+        if not in_main_thread():
+            self.result_queue.put_latest("progress_bar", ("progress_bar", percent, message))
+            return
+
         self.progress_bar['value'] = percent
         self.progress_label.config(text=message)
-        self.root.update_idletasks()
 
     def process_queue(self):
         """处理下载队列"""
         while True:
             try:
+                # 阻塞等待新任务，空闲时不占用CPU
+                task = self.download_queue.get()
                 if self.abort_all_tasks:
-                    # 清空队列
-                    while not self.download_queue.empty():
-                        self.download_queue.get()
-                        self.download_queue.task_done()
+                    self.download_queue.task_done()
                     continue
 
-                task = self.download_queue.get(timeout=1)
                 if task[0] == "download":
                     self.current_task_index += 1
                     self.update_progress(
@@ -629,7 +649,8 @@ class VideoMasterProApp:
                     )
 
                     # 为每个下载任务创建唯一ID
-                    task_id = f"task_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                    task_id = f"task_{self.current_task_index}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                    self.cancel_tokens[task_id] = CancellationToken()
 
                     # 在单独的线程中执行下载
                     thread = threading.Thread(
@@ -640,8 +661,6 @@ class VideoMasterProApp:
                     self.download_threads[task_id] = thread
                     thread.start()
                     self.download_queue.task_done()
-            except queue.Empty:
-                continue
             except Exception as e:
                 self.logger.error(f"处理任务时出错: {str(e)}")
 
@@ -663,34 +682,42 @@ class VideoMasterProApp:
             if not os.path.exists(ydl_path):
                 ydl_path = "yt-dlp"  # 尝试系统路径
 
-            cmd = [ydl_path, "-f", format_id, "-o", f"{save_path}/%(title)s.%(ext)s"]
+            # 进度按固定格式输出原始数值，避免解析带颜色代码的进度文本
+            cmd = [ydl_path, "-f", format_id, "-o", f"{save_path}/%(title)s.%(ext)s",
+                   "--newline", "--progress-template", PROGRESS_TEMPLATE]
             if proxy:
                 cmd.extend(["--proxy", proxy])
             if download_subtitles:
                 cmd.extend(["--write-subs", "--write-auto-subs", "--sub-langs", "en,zh-Hans,zh-Hant"])
             cmd.append(url)
             
-            # 执行下载
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                                     universal_newlines=True, encoding='utf-8')
+            # 执行下载（独立进程组，取消时连同子进程一起结束）
+            token = self.cancel_tokens[task_id]
+            # 进度输出在 stdout、错误信息在 stderr，合并读取，避免未读取的管道写满后阻塞子进程
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                     universal_newlines=True, encoding='utf-8',
+                                     **process_group_kwargs())
+            token.on_cancel(lambda: terminate_process_tree(process))
             
-            # 监控下载进度
-            while True:
-                output = process.stderr.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output and '[download]' in output:
-                    self.result_queue.put(("progress", output.strip()))
+            # 监控下载进度，其他输出保留最后几行用于报告错误
+            recent_output = deque(maxlen=20)
+            for output in process.stdout:
+                progress = parse_progress_line(output.strip())
+                if progress is None:
+                    if output.strip():
+                        recent_output.append(output.strip())
+                    continue
+                self._report_download_progress(progress)
 
             return_code = process.wait()
-            
-            if return_code != 0:
-                stderr_output = process.stderr.read()
-                raise Exception(f"下载失败，返回代码: {return_code}, 错误: {stderr_output}")
 
-            if self.abort_all_tasks:
+            if token.cancelled:
                 self.result_queue.put(("info", f"下载已取消"))
                 return
+            
+            if return_code != 0:
+                stderr_output = "\n".join(recent_output)
+                raise Exception(f"下载失败，返回代码: {return_code}, 错误: {stderr_output}")
 
             self.logger.info(f"下载完成")
             self.update_progress(100, "下载完成")
@@ -725,25 +752,46 @@ class VideoMasterProApp:
             self.is_downloading = False
             if task_id in self.download_threads:
                 del self.download_threads[task_id]
+            self.cancel_tokens.pop(task_id, None)
+
+    def _report_download_progress(self, progress):
+        """根据子进程输出的原始数值更新总进度"""
+        downloaded = progress['downloaded_bytes']
+        total = progress['total_bytes']
+        fraction = min(downloaded / total, 1.0) if total else 0.0
+        overall_progress = (self.current_task_index-1 + fraction) / self.total_tasks * 100
+        message = f"下载中 {self.current_task_index}/{self.total_tasks}: "
+        message += f"{fraction * 100:.1f}%" if total else format_bytes(downloaded)
+        if progress['speed']:
+            message += f"  速度: {format_bytes(progress['speed'])}/s"
+        if progress['eta'] is not None:
+            message += f"  剩余时间: {format_duration(progress['eta'])}"
+        self.update_progress(overall_progress, message)
 
     def process_results(self):
-        """处理结果队列"""
+        """处理结果队列（工作线程更新界面的唯一入口）
+
+        由结果队列的唤醒事件触发，空闲时不运行；每次最多处理 50 毫秒，剩余的在让出事件循环后继续处理。
+        """
+        if self.results_after_id is not None:
+            self.root.after_cancel(self.results_after_id)
+            self.results_after_id = None
+
         try:
-            while not self.result_queue.empty():
-                result = self.result_queue.get()
+            for result in self.result_queue.drain(50):
                 if result[0] == "info":
                     self._append_log(result[1], "info")
                 elif result[0] == "error":
                     self._append_log(f"错误: {result[1]}", "error")
                 elif result[0] == "success":
                     self._append_log(f"成功: {result[1]}", "success")
-                elif result[0] == "progress":
-                    self._update_progress(result[1])
+                elif result[0] == "progress_bar":
+                    self.update_progress(result[1], result[2])
         except Exception as e:
             self._append_log(f"处理结果时出错: {str(e)}", "error")
 
-        # 每隔100毫秒检查一次结果队列
-        self.root.after(100, self.process_results)
+        if self.result_queue.pending():
+            self.results_after_id = self.root.after(10, self.process_results)
 
     def _append_log(self, message, tag="info"):
         """向日志区域添加消息"""
@@ -752,15 +800,6 @@ class VideoMasterProApp:
         self.log_text.config(state=tk.DISABLED)
         self.log_text.see(tk.END)
 
-    def _update_progress(self, message):
-        """更新进度信息"""
-        self.log_text.config(state=tk.NORMAL)
-        # 清除最后一行（进度信息）
-        self.log_text.delete("end-2l", "end-1c")
-        self.log_text.insert(tk.END, message + "\n", "progress")
-        self.log_text.config(state=tk.DISABLED)
-        self.log_text.see(tk.END)
-
     def clear_logs(self):
         """清空日志区域"""
         self.log_text.config(state=tk.NORMAL)
@@ -819,13 +858,28 @@ class VideoMasterProApp:
         y = (screen_height - 600) // 2
         history_window.geometry(f"1000x600+{x}+{y}")
 
-        # 创建表格
+        # 筛选
+        filter_frame = tk.Frame(history_window)
+        filter_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        tk.Label(filter_frame, text="筛选:").pack(side=tk.LEFT)
+        filter_var = tk.StringVar()
+        tk.Entry(filter_frame, textvariable=filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+
+        # 创建表格（全部历史记录，只创建可见的行，点击列标题排序）
+        rows = [(i,
+                 entry.get("title", "未知"),
+                 entry.get("url", ""),
+                 entry.get("format_id", ""),
+                 entry.get("save_path", ""),
+                 entry.get("timestamp", ""))
+                for i, entry in enumerate(reversed(self.download_history), 1)]
         columns = ("序号", "标题", "URL", "格式", "保存路径", "时间")
-        tree = ttk.Treeview(history_window, columns=columns, show="headings")
+        view = VirtualTreeview(history_window, columns, VirtualListModel(rows))
+        filter_var.trace_add('write', lambda *args: view.set_filter(filter_var.get()))
+        tree = view.tree
 
-        # 设置列宽和标题
+        # 设置列宽
         for col in columns:
-            tree.heading(col, text=col)
             if col == "标题":
                 tree.column(col, width=250)
             elif col == "URL":
@@ -837,29 +891,12 @@ class VideoMasterProApp:
             else:
                 tree.column(col, width=80)
 
-        # 添加数据
-        for i, entry in enumerate(reversed(self.download_history), 1):
-            tree.insert("", "end", values=(
-                i,
-                entry.get("title", "未知"),
-                entry.get("url", ""),
-                entry.get("format_id", ""),
-                entry.get("save_path", ""),
-                entry.get("timestamp", "")
-            ))
-
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(history_window, orient="vertical", command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        tree.pack(fill=tk.BOTH, expand=True)
+        view.frame.pack(fill=tk.BOTH, expand=True)
 
         # 添加双击打开文件位置功能
         def open_file_location(event):
-            if tree.selection():
-                item = tree.selection()[0]
-                values = tree.item(item, "values")
+            values = view.selected_row()
+            if values is not None:
                 path = values[4]
 
                 if path and os.path.exists(path):
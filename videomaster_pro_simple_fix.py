@@ -18,6 +18,8 @@ from datetime import datetime
 import json
 import traceback
 
+from url_utils import parse_youtube_url, is_youtube_url, canonical_url
+
 class VideoMasterProSimpleFixApp:
     def __init__(self, root):
         self.root = root
@@ -151,56 +153,25 @@ class VideoMasterProSimpleFixApp:
         self.log_text.tag_config("ERROR", foreground="red")
     
     def validate_url_improved(self, url):
-        """改进的URL验证函数"""
-        try:
-            parsed = urlparse(url)
-            
-            # 检查基本URL结构
-            if not all([parsed.scheme, parsed.netloc]):
-                return False
-            
-            # 检查是否是YouTube域名
-            youtube_domains = [
-                'youtube.com', 'www.youtube.com', 
-                'youtu.be', 'www.youtu.be',
-                'music.youtube.com', 'm.youtube.com'
-            ]
-            
-            if parsed.netloc.lower() not in youtube_domains:
-                return False
-            
-            return True
-            
-        except Exception:
-            return False
+        """改进的URL验证函数（视频、播放列表、频道链接）"""
+        return is_youtube_url(url)
     
     def extract_clean_url(self, url):
-        """从复杂的YouTube链接中提取干净的视频URL"""
-        try:
-            parsed = urlparse(url)
-            query_params = parse_qs(parsed.query)
-            
-            # 如果是播放列表链接但包含视频ID，提取单个视频
-            if 'list' in query_params and 'v' in query_params:
-                video_id = query_params['v'][0]
-                clean_url = f"https://www.youtube.com/watch?v={video_id}"
-                
-                # 检查是否是YouTube Music自动播放列表
-                list_id = query_params['list'][0]
-                if list_id.startswith('RD'):
-                    self._append_log(f"🎵 检测到YouTube Music自动播放列表", "INFO")
-                    self._append_log(f"🎯 提取单个视频ID: {video_id}", "SUCCESS")
-                else:
-                    self._append_log(f"📋 检测到普通播放列表: {list_id}", "INFO")
-                    self._append_log(f"🎯 提取单个视频ID: {video_id}", "SUCCESS")
-                
-                return clean_url
-            
-            return url
-            
-        except Exception as e:
-            self._append_log(f"URL处理错误: {e}", "WARNING")
+        """从复杂的YouTube链接中提取干净的视频URL（去掉播放列表和跟踪参数）"""
+        key = parse_youtube_url(url)
+        if key is None or key.kind != 'video':
             return url
+        
+        # 如果是播放列表链接但包含视频ID，提取单个视频
+        if key.list_id:
+            # 检查是否是YouTube Music自动播放列表
+            if key.list_id.startswith('RD'):
+                self._append_log("🎵 检测到YouTube Music自动播放列表", "INFO")
+            else:
+                self._append_log(f"📋 检测到普通播放列表: {key.list_id}", "INFO")
+            self._append_log(f"🎯 提取单个视频ID: {key.id}", "SUCCESS")
+        
+        return canonical_url(key)
     
     def analyze_link(self):
         """分析链接结构"""
@@ -292,7 +263,7 @@ class VideoMasterProSimpleFixApp:
             messagebox.showerror("错误", "请输入有效的YouTube链接")
             return
         
-        self._append_log(f"🚀 开始获取视频信息...", "INFO")
+        self._append_log("🚀 开始获取视频信息...", "INFO")
         
         def _fetch():
             try:
@@ -333,14 +304,14 @@ class VideoMasterProSimpleFixApp:
                     ])
                     
                     self.video_info[clean_url] = info
-                    self.result_queue.put(('success', f"✅ 获取视频信息成功!"))
+                    self.result_queue.put(('success', "✅ 获取视频信息成功!"))
                     self.result_queue.put(('info', f"🎬 标题: {title}"))
                     self.result_queue.put(('info', f"🆔 视频ID: {video_id}"))
                     self.result_queue.put(('info', f"👤 作者: {uploader}"))
                     
             except Exception as e:
                 error_msg = str(e)
-                self.result_queue.put(('error', f"❌ 获取视频信息失败"))
+                self.result_queue.put(('error', "❌ 获取视频信息失败"))
                 
                 # 分析错误类型并给出建议
                 if "Unable to download API page" in error_msg:
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+虚拟列表
+VirtualListModel 只保存行数据，排序和筛选在预先计算的索引上进行；
+VirtualTreeview 只为可见的行创建 Treeview 条目，滚动时复用这些条目替换内容，
+十万行历史记录或上百个格式也能立即打开、排序和筛选。
+"""
+
+import tkinter as tk
+from functools import partial
+from tkinter import ttk
+
+
+class VirtualListModel:
+    """行数据及当前视图（排序、筛选后的行下标列表）
+
+    rows: 每行为显示值的元组
+    sort_keys: {列下标: 与 rows 等长的排序键序列}，未提供的列按显示值排序
+    """
+
+    def __init__(self, rows, sort_keys=None):
+        self.rows = rows
+        self.sort_keys = sort_keys or {}
+        self.sort_column = None
+        self.descending = False
+        self.filter_text = ''
+        # 每列的升序下标（首次按该列排序时计算），以及每行的小写搜索文本（首次筛选时计算）
+        self._orders = {}
+        self._search = None
+        # 筛选命中的行下标（原始顺序），未筛选时为 None
+        self._matched = None
+        self.view = list(range(len(rows)))
+
+    def __len__(self):
+        return len(self.view)
+
+    def row(self, position):
+        """视图中第 position 行的数据"""
+        return self.rows[self.view[position]]
+
+    def index(self, position):
+        """视图中第 position 行在 rows 中的下标"""
+        return self.view[position]
+
+    def reset(self):
+        """恢复原始顺序并清除筛选（保留已计算的排序和搜索索引）"""
+        self.sort_column = None
+        self.descending = False
+        self.filter_text = ''
+        self._matched = None
+        self._rebuild()
+
+    def sort(self, column, descending=False):
+        self.sort_column = column
+        self.descending = descending
+        self._rebuild()
+
+    def set_filter(self, text):
+        """按子串筛选（不区分大小写，匹配任意一列）"""
+        text = text.strip().lower()
+        if text == self.filter_text:
+            return
+
+        if not text:
+            self._matched = None
+        else:
+            if self._search is None:
+                # 列之间用不会出现在文本中的字符分隔，避免跨列匹配
+                self._search = ['\0'.join(map(str, row)).lower() for row in self.rows]
+            search = self._search
+            # 输入在上一次的条件上追加字符时，只需在上一次的结果中继续筛选
+            if self._matched is not None and self.filter_text in text:
+                candidates = self._matched
+            else:
+                candidates = range(len(self.rows))
+            self._matched = [i for i in candidates if text in search[i]]
+        self.filter_text = text
+        self._rebuild()
+
+    def _order(self, column):
+        order = self._orders.get(column)
+        if order is None:
+            keys = self.sort_keys.get(column)
+            if keys is None:
+                keys = [row[column] for row in self.rows]
+            order = self._orders[column] = sorted(range(len(self.rows)), key=keys.__getitem__)
+        return order
+
+    def _rebuild(self):
+        if self.sort_column is None:
+            self.view = list(range(len(self.rows))) if self._matched is None else list(self._matched)
+        else:
+            order = self._order(self.sort_column)
+            if self.descending:
+                order = reversed(order)
+            if self._matched is None:
+                self.view = list(order)
+            else:
+                mask = bytearray(len(self.rows))
+                for i in self._matched:
+                    mask[i] = 1
+                self.view = [i for i in order if mask[i]]
+
+
+class VirtualTreeview:
+    """只创建可见行的 Treeview（单选）
+
+    self.frame 包含表格和滚动条，由调用方布局；点击列标题按该列排序，再次点击切换升降序。
+    """
+
+    def __init__(self, parent, columns, model=None, **tree_options):
+        self.columns = columns
+        self.model = model if model is not None else VirtualListModel([])
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", selectmode="browse", **tree_options)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for column, name in enumerate(columns):
+            self.tree.heading(name, text=name, command=partial(self.sort_by, column))
+
+        # 视图中第一个可见行的位置、可见行数，以及当前创建的条目和其显示的内容
+        self.offset = 0
+        self.page = int(self.tree.cget('height'))
+        self.items = []
+        self.shown = []
+        # 选中行在 model.rows 中的下标
+        self.selected = None
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", self._on_wheel)
+        self.tree.bind("<Button-5>", self._on_wheel)
+        for key, step, pages in (("<Up>", -1, False), ("<Down>", 1, False), ("<Prior>", -1, True), ("<Next>", 1, True)):
+            self.tree.bind(key, partial(self._on_key, step, pages))
+
+        self.refresh()
+
+    def set_model(self, model):
+        self.model = model
+        self.offset = 0
+        self.selected = None
+        self.refresh()
+
+    def sort_by(self, column):
+        descending = self.model.sort_column == column and not self.model.descending
+        self.model.sort(column, descending)
+        for i, name in enumerate(self.columns):
+            arrow = (" ▼" if descending else " ▲") if i == column else ""
+            self.tree.heading(name, text=name + arrow)
+        self.offset = 0
+        self.refresh()
+
+    def set_filter(self, text):
+        self.model.set_filter(text)
+        self.offset = 0
+        self.selected = None
+        self.refresh()
+
+    def selected_row(self):
+        """选中行的数据，没有选中时返回 None"""
+        if self.selected is None:
+            return None
+        return self.model.rows[self.selected]
+
+    def refresh(self):
+        """按当前位置重新填充可见的条目，只更新内容有变化的条目"""
+        total = len(self.model)
+        self.offset = max(0, min(self.offset, total - self.page))
+        count = min(self.page, total - self.offset)
+
+        while len(self.items) < count:
+            self.items.append(self.tree.insert("", "end"))
+            self.shown.append(None)
+        while len(self.items) > count:
+            self.tree.delete(self.items.pop())
+            self.shown.pop()
+
+        selected_item = None
+        for n, item in enumerate(self.items):
+            index = self.model.index(self.offset + n)
+            values = self.model.rows[index]
+            if self.shown[n] != values:
+                self.tree.item(item, values=values)
+                self.shown[n] = values
+            if index == self.selected:
+                selected_item = item
+
+        if selected_item is not None:
+            if self.tree.selection() != (selected_item,):
+                self.tree.selection_set(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.model))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            self.offset += step * self.page if args[2] == 'pages' else step
+        self.refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            rows = -3
+        elif event.num == 5:
+            rows = 3
+        else:
+            rows = -3 if event.delta > 0 else 3
+        self.scroll(rows)
+        return "break"
+
+    def _on_resize(self, event):
+        # 用第一个条目的位置和高度计算表头高度和行高
+        bbox = self.tree.bbox(self.items[0]) if self.items else None
+        if bbox:
+            header, row_height = bbox[1], bbox[3]
+        else:
+            header, row_height = 25, 20
+        page = max(1, (event.height - header) // row_height)
+        if page != self.page:
+            self.page = page
+            self.refresh()
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.items:
+            self.selected = self.model.index(self.offset + self.items.index(selection[0]))
+
+    def _on_key(self, step, pages, event):
+        """方向键和翻页键移动选中行，超出可见范围时滚动；没有选中行时选中第一个可见行"""
+        total = len(self.model)
+        if not total:
+            return "break"
+        try:
+            position = self.model.view.index(self.selected) + (step * self.page if pages else step)
+        except ValueError:
+            position = self.offset
+        position = max(0, min(position, total - 1))
+        self.selected = self.model.index(position)
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.page:
+            self.offset = position - self.page + 1
+        self.refresh()
+        return "break"
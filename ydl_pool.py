@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YoutubeDL 实例池
+按配置（代理、输出模板、格式等）复用已初始化的 YoutubeDL 实例，
+避免每次解析/下载都重新注册提取器、加载 Cookie，并保留 HTTP keep-alive 连接
+和提取器实例内缓存的播放器 JS。
+进度回调、后处理回调、日志对象、分片并发数和格式选择按每次租用单独绑定，归还时清除。
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import yt_dlp
+
+# 每次租用单独设置的选项，不参与配置分组
+# （format 在 YoutubeDL 初始化时会编译为 format_selector，租用时需要重新编译）
+LEASE_KEYS = ('progress_hooks', 'postprocessor_hooks', 'logger', 'concurrent_fragment_downloads', 'format')
+
+
+def profile_key(opts):
+    """把选项字典转换为可哈希的配置键（不含按租用绑定的选项）"""
+    profile = {key: value for key, value in opts.items() if key not in LEASE_KEYS}
+    return json.dumps(profile, sort_keys=True, ensure_ascii=False, default=repr)
+
+
+class YDLPool:
+    """按配置分组的 YoutubeDL 实例池，所有方法均可在多个线程中调用
+
+    同一实例同一时间只租给一个线程；同一配置的并发租用会各自创建实例，
+    归还后每个配置最多保留 max_idle_per_profile 个空闲实例，最多保留 max_profiles 个配置。
+    """
+
+    def __init__(self, max_idle_per_profile=4, max_profiles=8, idle_timeout=600):
+        self.max_idle_per_profile = max_idle_per_profile
+        self.max_profiles = max_profiles
+        # 空闲过久的连接通常已被服务器关闭，直接丢弃
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        # 配置键 -> [(归还时间, YoutubeDL), ...]，按最近使用排序
+        self.idle = OrderedDict()
+
+    def _acquire(self, key, opts):
+        """取出一个空闲实例，没有时新建"""
+        now = time.time()
+        expired = []
+        ydl = None
+        with self.lock:
+            handles = self.idle.get(key)
+            while handles:
+                released_at, handle = handles.pop()
+                if now - released_at < self.idle_timeout:
+                    ydl = handle
+                    break
+                expired.append(handle)
+            if handles is not None and not handles:
+                del self.idle[key]
+
+        for handle in expired:
+            self._close(handle)
+
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({key: value for key, value in opts.items() if key not in LEASE_KEYS})
+        return ydl
+
+    def _release(self, key, ydl):
+        """归还实例，超出空闲上限的实例直接关闭"""
+        evicted = []
+        with self.lock:
+            handles = self.idle.setdefault(key, [])
+            self.idle.move_to_end(key)
+            if len(handles) < self.max_idle_per_profile:
+                handles.append((time.time(), ydl))
+            else:
+                evicted.append(ydl)
+
+            while len(self.idle) > self.max_profiles:
+                _, old_handles = self.idle.popitem(last=False)
+                evicted.extend(handle for _, handle in old_handles)
+
+        for handle in evicted:
+            self._close(handle)
+
+    @staticmethod
+    def _close(ydl):
+        try:
+            ydl.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def lease(self, opts):
+        """租用一个与 opts 配置一致的 YoutubeDL 实例
+
+        opts 中的 progress_hooks、postprocessor_hooks、logger、concurrent_fragment_downloads、format
+        只对本次租用生效（每个视频可以使用不同的格式，而不必各自创建实例）；租用期间添加的后处理器在归还时移除。
+        出错的实例不再放回池中，避免复用状态异常的连接。
+        """
+        key = profile_key(opts)
+        ydl = self._acquire(key, opts)
+
+        # 绑定本次租用的回调和选项
+        pps = {when: list(pps) for when, pps in ydl._pps.items()}
+        for name in LEASE_KEYS:
+            if name in ('progress_hooks', 'postprocessor_hooks'):
+                continue
+            if opts.get(name) is not None:
+                ydl.params[name] = opts[name]
+            else:
+                ydl.params.pop(name, None)
+        ydl._progress_hooks = list(opts.get('progress_hooks') or [])
+        ydl._postprocessor_hooks = list(opts.get('postprocessor_hooks') or [])
+        ydl.format_selector = ydl.build_format_selector(opts['format']) if opts.get('format') else None
+
+        try:
+            yield ydl
+        except BaseException:
+            self._close(ydl)
+            raise
+
+        # 清除本次租用的状态后归还
+        ydl._pps = pps
+        ydl._progress_hooks = []
+        ydl._postprocessor_hooks = []
+        ydl.format_selector = None
+        for name in LEASE_KEYS:
+            ydl.params.pop(name, None)
+        self._release(key, ydl)
+
+    def close(self):
+        """关闭所有空闲实例"""
+        with self.lock:
+            handles = [handle for idle in self.idle.values() for _, handle in idle]
+            self.idle.clear()
+        for handle in handles:
+            self._close(handle)
@@ -12,6 +12,9 @@ import json
 import subprocess
 import platform
 
+from batch_planner import format_bytes, format_duration
+from ui_dispatch import UIEventQueue, in_main_thread
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -67,7 +70,8 @@ class YouTubeDownloaderApp:
 
         # 初始化变量
         self.download_queue = queue.Queue()
-        self.result_queue = queue.Queue()
+        # 工作线程只向结果队列发布事件，控件统一在 process_results 中更新
+        self.result_queue = UIEventQueue()
 
         self.download_tasks = []
         self.current_task_index = 0
@@ -92,7 +96,10 @@ class YouTubeDownloaderApp:
         self.processing_thread = threading.Thread(target=self.process_queue, daemon=True)
         self.processing_thread.start()
 
-        self.root.after(100, self.process_results)
+        # 有新事件时由工作线程唤醒结果处理，不再定时轮询
+        self.results_after_id = None
+        self.result_queue.bind_tk(self.root, self.process_results)
+        self.process_results()
 
         self.ydl_instance = None
         self.is_downloading = False
@@ -130,7 +137,7 @@ class YouTubeDownloaderApp:
             def emit(self, record):
                 self.log_queue.put((record.levelname, self.format(record)))
 
-        self.result_queue = queue.Queue()
+        self.result_queue = UIEventQueue()
         self.log_handler = QueueHandler(self.result_queue)
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         self.log_handler.setFormatter(formatter)
@@ -289,10 +296,7 @@ class YouTubeDownloaderApp:
                 # 格式化观看次数
                 views_str = f"{views:,}"
 
-                self.title_var.set(f"标题: {title}")
-                self.duration_var.set(f"时长: {duration_str}")
-                self.views_var.set(f"观看次数: {views_str}")
-                self.uploader_var.set(f"上传者: {uploader}")
+                self.result_queue.call(self._show_video_info, title, duration_str, views_str, uploader)
 
                 # 保存视频信息
                 self.video_info[url] = info_dict
@@ -304,6 +308,13 @@ class YouTubeDownloaderApp:
         # 在单独线程中获取信息
         threading.Thread(target=_fetch, daemon=True).start()
 
+    def _show_video_info(self, title, duration_str, views_str, uploader):
+        """显示视频信息"""
+        self.title_var.set(f"标题: {title}")
+        self.duration_var.set(f"时长: {duration_str}")
+        self.views_var.set(f"观看次数: {views_str}")
+        self.uploader_var.set(f"上传者: {uploader}")
+
     def query_formats(self):
         """查询视频格式"""
         url = self.url_entry.get().strip()
@@ -398,8 +409,7 @@ class YouTubeDownloaderApp:
         self.abort_all_tasks = False
         self.update_progress(0, "准备下载...")
 
-        # 创建下载队列
-        self.download_queue = queue.Queue()
+        # 加入下载队列（处理线程阻塞在同一个队列上，不能替换）
         for url in urls:
             self.logger.info(f"添加下载任务: {url} (格式: {format_id})")
             self.download_queue.put(("download", url, proxy, save_path, format_id, download_subtitles, thread_count, transcode, transcode_format))
@@ -413,6 +423,14 @@ class YouTubeDownloaderApp:
         self.abort_all_tasks = True
         self.logger.info("正在终止所有下载任务...")
 
+        # 丢弃排队中的任务
+        while True:
+            try:
+                self.download_queue.get_nowait()
+                self.download_queue.task_done()
+            except queue.Empty:
+                break
+
         # 终止当前下载
         if self.ydl_instance:
             self.ydl_instance._download_retcode = -1  # 设置退出码强制终止
@@ -430,23 +448,27 @@ class YouTubeDownloaderApp:
         self.logger.info("所有下载任务已终止")
 
     def update_progress(self, percent, message):
-        """更新进度条和进度信息"""
+        """更新进度条和进度信息
+
+        在下载线程中调用时只记录最新进度，由界面线程在下一次处理结果队列时更新进度条。
+        """
+        if not in_main_thread():
+            self.result_queue.put_latest("progress_bar", ("progress_bar", percent, message))
+            return
+
         self.progress_bar['value'] = percent
         self.progress_label.config(text=message)
-        self.root.update_idletasks()
 
     def process_queue(self):
         """处理下载队列"""
         while True:
             try:
+                # 阻塞等待新任务，空闲时不占用CPU
+                task = self.download_queue.get()
                 if self.abort_all_tasks:
-                    # 清空队列
-                    while not self.download_queue.empty():
-                        self.download_queue.get()
-                        self.download_queue.task_done()
+                    self.download_queue.task_done()
                     continue
 
-                task = self.download_queue.get(timeout=1)
                 if task[0] == "download":
                     self.current_task_index += 1
                     self.update_progress(
@@ -466,8 +488,6 @@ class YouTubeDownloaderApp:
                     self.download_threads[task_id] = thread
                     thread.start()
                     self.download_queue.task_done()
-            except queue.Empty:
-                continue
             except Exception as e:
                 self.logger.error(f"处理任务时出错: {str(e)}")
 
@@ -574,27 +594,36 @@ class YouTubeDownloaderApp:
             return
 
         if d['status'] == 'downloading':
-            percent = d.get('_percent_str', '?')
-            speed = d.get('_speed_str', '?')
-            eta = d.get('_eta_str', '?')
-            self.result_queue.put(("progress", f"下载中: {percent} 速度: {speed} 剩余时间: {eta}"))
-
-            # 更新进度条
-            if '%' in percent:
-                try:
-                    progress = float(percent.strip('%'))
-                    overall_progress = (self.current_task_index-1 + progress/100) / self.total_tasks * 100
-                    self.update_progress(overall_progress, f"下载中 {self.current_task_index}/{self.total_tasks}: {percent}")
-                except:
-                    pass
+            # 使用原始数值计算进度（_percent_str 等字段带有 ANSI 颜色代码，无法直接解析）
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            speed = d.get('speed')
+            eta = d.get('eta')
+
+            progress = min(downloaded / total, 1.0) if total else 0.0
+            overall_progress = (self.current_task_index-1 + progress) / self.total_tasks * 100
+            message = f"下载中 {self.current_task_index}/{self.total_tasks}: "
+            message += f"{progress * 100:.1f}%" if total else format_bytes(downloaded)
+            if speed:
+                message += f"  速度: {format_bytes(speed)}/s"
+            if eta is not None:
+                message += f"  剩余时间: {format_duration(eta)}"
+            # 进度回调非常频繁，只由界面线程按最新值更新进度条
+            self.update_progress(overall_progress, message)
         elif d['status'] == 'finished':
             self.result_queue.put(("info", "正在处理文件..."))
 
     def process_results(self):
-        """处理结果队列"""
+        """处理结果队列（工作线程更新界面的唯一入口）
+
+        由结果队列的唤醒事件触发，空闲时不运行；每次最多处理 50 毫秒，剩余的在让出事件循环后继续处理。
+        """
+        if self.results_after_id is not None:
+            self.root.after_cancel(self.results_after_id)
+            self.results_after_id = None
+
         try:
-            while not self.result_queue.empty():
-                result = self.result_queue.get()
+            for result in self.result_queue.drain(50):
                 if result[0] == "info":
                     self._append_log(result[1], "info")
                 elif result[0] == "formats_queried":
@@ -605,13 +634,15 @@ class YouTubeDownloaderApp:
                     self._append_log(f"错误: {result[1]}", "error")
                 elif result[0] == "success":
                     self._append_log(f"成功: {result[1]}", "success")
-                elif result[0] == "progress":
-                    self._update_progress(result[1])
+                elif result[0] == "progress_bar":
+                    self.update_progress(result[1], result[2])
+                elif result[0] == "call":
+                    result[1](*result[2])
         except Exception as e:
             self._append_log(f"处理结果时出错: {str(e)}", "error")
 
-        # 每隔100毫秒检查一次结果队列
-        self.root.after(100, self.process_results)
+        if self.result_queue.pending():
+            self.results_after_id = self.root.after(10, self.process_results)
 
     def _append_log(self, message, tag="info"):
         """向日志区域添加消息"""
@@ -620,15 +651,6 @@ class YouTubeDownloaderApp:
         self.log_text.config(state=tk.DISABLED)
         self.log_text.see(tk.END)
 
-    def _update_progress(self, message):
-        """更新进度信息"""
-        self.log_text.config(state=tk.NORMAL)
-        # 清除最后一行（进度信息）
-        self.log_text.delete("end-2l", "end-1c")
-        self.log_text.insert(tk.END, message + "\n", "progress")
-        self.log_text.config(state=tk.DISABLED)
-        self.log_text.see(tk.END)
-
     def clear_logs(self):
         """清空日志区域"""
         self.log_text.config(state=tk.NORMAL)